@@ -1,97 +1,179 @@
 # cart/cart.py
-from decimal import Decimal
 from django.conf import settings
 from catalog.models import Bouquet
 
+from .codec import decode_cart, encode_cart, from_minor_units, to_minor_units
+from .storage import close_user_cart, load_user_cart, merge_carts, save_user_cart
+
+
+class CartDiff:
+    """Расхождения корзины с текущими ценами и наличием букетов (см. Cart.revalidate)."""
+
+    def __init__(self):
+        # {'bouquet', 'quantity', 'old_price', 'new_price'}
+        self.changed = []
+        # {'name', 'quantity'}; name — None, если букет удалён из каталога
+        self.removed = []
+
+    def __bool__(self):
+        return bool(self.changed or self.removed)
+
+
 class Cart:
-    def __init__(self, request):
+    def __init__(self, request, user=None):
         """
-        Инициализация корзины.
+        Инициализация корзины. user передаётся, когда request.user ещё не выставлен.
         """
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            # Сохраняем пустую корзину в сессии
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        user = user or getattr(request, 'user', None)
+        self.user_id = user.pk if user is not None and user.is_authenticated else None
+        # Букеты, убранные из корзины пользователя с последней записи в базу
+        self._removed = set()
+        # Букеты, загруженные revalidate(); __iter__ тогда не запрашивает их повторно
+        self._bouquets = None
+        stored = self.session.get(settings.CART_SESSION_ID)
+
+        if self.user_id is None:
+            # Пустая корзина в сессию не записывается: сессия (и строка в базе)
+            # появляется только когда в корзину положили товар
+            self.cart_id = None
+            self.cart = decode_cart(stored)
+            if isinstance(stored, dict):
+                # Корзина в старом формате — переписываем её в новом
+                self.save()
+            return
+
+        self.cart_id, self.cart = load_user_cart(self.user_id)
+        if stored is not None:
+            # Корзина, собранная до входа, переносится в корзину пользователя
+            merge_carts(self.cart, decode_cart(stored))
+            del self.session[settings.CART_SESSION_ID]
+            self.save()
 
     def add(self, bouquet, quantity=1, update_quantity=False):
         """
         Добавить букет в корзину или обновить его количество.
         """
-        bouquet_id = str(bouquet.id)
-        if bouquet_id not in self.cart:
-            self.cart[bouquet_id] = {'quantity': 0, 'price': str(bouquet.price)}
+        item = self.cart.setdefault(bouquet.id, [0, to_minor_units(bouquet.price)])
 
         if update_quantity:
-            self.cart[bouquet_id]['quantity'] = quantity
+            item[0] = quantity
         else:
-            self.cart[bouquet_id]['quantity'] += quantity
+            item[0] += quantity
 
         # Не допускаем отрицательное или нулевое количество
-        if self.cart[bouquet_id]['quantity'] <= 0:
+        if item[0] <= 0:
              self.remove(bouquet)
         else:
             self.save()
 
 
     def save(self):
-        # Помечаем сессию как "измененную", чтобы убедиться, что она сохранится
-        self.session.modified = True
+        if self.user_id is not None:
+            self.cart_id = save_user_cart(self.user_id, self.cart_id, self.cart, self._removed)
+            self._removed = set()
+            return
+        # Сессия сохраняется один раз в конце запроса (SessionMiddleware),
+        # сколько бы изменений ни было сделано за запрос
+        if self.cart:
+            self.session[settings.CART_SESSION_ID] = encode_cart(self.cart)
+        elif settings.CART_SESSION_ID in self.session:
+            del self.session[settings.CART_SESSION_ID]
 
     def remove(self, bouquet):
         """
         Удалить букет из корзины.
         """
-        bouquet_id = str(bouquet.id)
-        if bouquet_id in self.cart:
-            del self.cart[bouquet_id]
+        if self.cart.pop(bouquet.id, None) is not None:
+            self._removed.add(bouquet.id)
             self.save()
 
+    def bouquet_ids(self):
+        return list(self.cart)
+
+    def discard(self, bouquet_ids):
+        """Удалить из корзины букеты с указанными id. Возвращает число удалённых позиций."""
+        removed = [bouquet_id for bouquet_id in bouquet_ids if self.cart.pop(bouquet_id, None) is not None]
+        if removed:
+            self._removed.update(removed)
+            self.save()
+        return len(removed)
+
     def __iter__(self):
         """
         Перебираем товары в корзине и получаем букеты из базы данных.
         """
-        bouquet_ids = self.cart.keys()
-        # Получаем объекты букетов и добавляем их в корзину
-        bouquets = Bouquet.objects.filter(id__in=bouquet_ids, is_active=True)
-
-        cart = self.cart.copy()
-        for bouquet in bouquets:
-            cart[str(bouquet.id)]['bouquet'] = bouquet
-
-        for item in cart.values():
-            # Проверяем, что объект букета был найден (он может быть неактивным)
-            if 'bouquet' in item:
-                item['price'] = Decimal(item['price'])
-                item['total_price'] = item['price'] * item['quantity']
-                yield item
-            else:
-                 # Если букета нет (удален/неактивен), удаляем его из сессии на лету
-                 # Это не самый лучший способ, но для примера пойдет
-                 bouquet_id_to_remove = None
-                 for b_id, b_data in self.cart.items():
-                     if 'bouquet' not in b_data: # Ищем элемент без объекта букета
-                         bouquet_id_to_remove = b_id
-                         break
-                 if bouquet_id_to_remove:
-                     del self.cart[bouquet_id_to_remove]
-                     self.save()
+        bouquets = self._bouquets
+        if bouquets is None or not self.cart.keys() <= bouquets.keys():
+            bouquets = {
+                bouquet.id: bouquet
+                for bouquet in Bouquet.objects.filter(id__in=self.cart, is_active=True)
+            }
+        # Букеты, которые удалили или сняли с продажи, убираем из корзины
+        self.discard([bouquet_id for bouquet_id in self.cart if bouquet_id not in bouquets])
 
+        for bouquet_id, (quantity, price) in list(self.cart.items()):
+            yield {
+                'bouquet': bouquets[bouquet_id],
+                'quantity': quantity,
+                'price': from_minor_units(price),
+                'total_price': from_minor_units(price * quantity),
+            }
+
+    def revalidate(self):
+        """
+        Сверяет корзину с текущими ценами и is_active букетов одним запросом:
+        обновляет цены, убирает снятые с продажи букеты и возвращает CartDiff.
+        """
+        bouquets = {bouquet.id: bouquet for bouquet in Bouquet.objects.filter(id__in=list(self.cart))}
+        diff = CartDiff()
+        for bouquet_id, item in list(self.cart.items()):
+            bouquet = bouquets.get(bouquet_id)
+            if bouquet is None or not bouquet.is_active:
+                del self.cart[bouquet_id]
+                self._removed.add(bouquet_id)
+                diff.removed.append({'name': bouquet.name if bouquet else None, 'quantity': item[0]})
+                continue
+            price = to_minor_units(bouquet.price)
+            if price != item[1]:
+                diff.changed.append({
+                    'bouquet': bouquet,
+                    'quantity': item[0],
+                    'old_price': from_minor_units(item[1]),
+                    'new_price': from_minor_units(price),
+                })
+                item[1] = price
+        if diff:
+            self.save()
+        self._bouquets = {bouquet_id: bouquets[bouquet_id] for bouquet_id in self.cart}
+        return diff
 
     def __len__(self):
         """
         Считаем общее количество товаров в корзине.
         """
-        return sum(item['quantity'] for item in self.cart.values())
+        return sum(quantity for quantity, _ in self.cart.values())
 
     def get_total_price(self):
         """
         Считаем общую стоимость товаров в корзине.
         """
-        return sum(Decimal(item['price']) * item['quantity'] for item in self.cart.values())
+        return from_minor_units(sum(quantity * price for quantity, price in self.cart.values()))
 
     def clear(self):
         # Удаляем корзину из сессии
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
\ No newline at end of file
+        self._removed.update(self.cart)
+        self.cart = {}
+        self.save()
+
+    def close(self, status='ordered'):
+        """
+        Завершить корзину: у пользователя строка Cart получает статус status
+        (и остаётся в базе вместе с позициями), у гостя корзина просто очищается.
+        """
+        if self.user_id is None:
+            self.clear()
+            return
+        close_user_cart(self.user_id, self.cart_id, status)
+        self.cart_id = None
+        self.cart = {}
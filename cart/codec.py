@@ -0,0 +1,42 @@
+# cart/codec.py
+from decimal import Decimal, ROUND_HALF_UP
+
+# Корзина хранится (в сессии и в кэше корзин пользователей) плоским списком целых чисел:
+# [версия, id, количество, цена в копейках, id, количество, цена в копейках, ...]
+# Такой список короче словаря со строковыми ценами и разбирается без Decimal.
+CART_FORMAT_VERSION = 2
+CART_FIELDS = 3
+
+
+def to_minor_units(price):
+    return int((Decimal(price) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_minor_units(value):
+    return Decimal(value).scaleb(-2)
+
+
+def decode_cart(value):
+    """
+    Содержимое упакованной корзины: {id букета: [количество, цена в копейках]}.
+    Понимает и прежний формат {'<id>': {'quantity': n, 'price': '123.45'}}.
+    """
+    if isinstance(value, list) and value and value[0] == CART_FORMAT_VERSION:
+        packed = value[1:]
+        return {
+            packed[i]: [packed[i + 1], packed[i + 2]]
+            for i in range(0, len(packed) - CART_FIELDS + 1, CART_FIELDS)
+        }
+    if isinstance(value, dict):
+        return {
+            int(bouquet_id): [int(item['quantity']), to_minor_units(item['price'])]
+            for bouquet_id, item in value.items()
+        }
+    return {}
+
+
+def encode_cart(items):
+    packed = [CART_FORMAT_VERSION]
+    for bouquet_id, (quantity, price) in items.items():
+        packed.extend((bouquet_id, quantity, price))
+    return packed
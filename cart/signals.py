@@ -0,0 +1,29 @@
+# cart/signals.py
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from orders.models import Cart as CartModel, CartItem
+
+from .cart import Cart
+from .storage import invalidate_user_cart
+
+
+@receiver([post_save, post_delete], sender=CartModel)
+def invalidate_cart(sender, instance, **kwargs):
+    # Корзину поменяли мимо cart.cart.Cart (админка, seed_data) — кэш пользователя устарел
+    invalidate_user_cart(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=CartItem)
+def invalidate_cart_item(sender, instance, **kwargs):
+    user_id = CartModel.objects.filter(pk=instance.cart_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_user_cart(user_id)
+
+
+@receiver(user_logged_in)
+def merge_session_cart(sender, request, user, **kwargs):
+    # Cart сам переносит корзину из сессии в корзину пользователя
+    if request is not None and hasattr(request, 'session'):
+        Cart(request, user=user)
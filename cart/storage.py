@@ -0,0 +1,99 @@
+# cart/storage.py
+# Корзина авторизованного покупателя хранится в orders.Cart/CartItem, поэтому
+# переживает выход из аккаунта и видна с любого устройства.
+# Каждое изменение корзины записывается в базу одним INSERT ... ON CONFLICT DO UPDATE
+# по всем позициям (плюс DELETE, если позиции убрали). Читается корзина из кэша
+# под ключом пользователя — в том же упакованном виде, что и в сессии, — так что
+# обычная страница не делает ни одного запроса к таблицам корзины.
+# Кэш используется, только если он общий для всех процессов (SHARED_CACHE):
+# с локальным кэшем изменение в одном воркере не сбросило бы копию в другом.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from orders.models import Cart as CartModel, CartItem
+
+from .codec import decode_cart, encode_cart, from_minor_units, to_minor_units
+
+
+def user_cart_key(user_id):
+    return f'cart:user:{user_id}'
+
+
+def invalidate_user_cart(user_id):
+    cache.delete(user_cart_key(user_id))
+
+
+def _remember(user_id, cart_id, items):
+    if settings.SHARED_CACHE:
+        cache.set(user_cart_key(user_id), (cart_id, encode_cart(items)), settings.CART_CACHE_TIMEOUT)
+
+
+def load_user_cart(user_id):
+    """(id активной корзины или None, {id букета: [количество, цена в копейках]})."""
+    cached = cache.get(user_cart_key(user_id)) if settings.SHARED_CACHE else None
+    if cached is not None:
+        cart_id, packed = cached
+        return cart_id, decode_cart(packed)
+
+    cart_id = (
+        CartModel.objects.filter(user_id=user_id, status='active')
+        .values_list('id', flat=True).first()
+    )
+    items = {}
+    if cart_id is not None:
+        rows = CartItem.objects.filter(cart_id=cart_id).values_list(
+            'bouquet_id', 'quantity', 'price', 'bouquet__price'
+        )
+        for bouquet_id, quantity, price, bouquet_price in rows:
+            # У позиций, созданных до появления поля price, берём текущую цену букета
+            items[bouquet_id] = [quantity, to_minor_units(price if price is not None else bouquet_price)]
+    _remember(user_id, cart_id, items)
+    return cart_id, items
+
+
+def save_user_cart(user_id, cart_id, items, removed_ids=()):
+    """
+    Записывает корзину пользователя: одна вставка-обновление всех позиций и
+    удаление убранных. Возвращает id корзины (создаёт её при первой записи).
+    """
+    if cart_id is None and not items:
+        # Пустую корзину в базе не заводим
+        _remember(user_id, None, {})
+        return None
+    with transaction.atomic():
+        if cart_id is None:
+            cart_id = CartModel.objects.get_or_create(user_id=user_id, status='active')[0].pk
+        if items:
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(cart_id=cart_id, bouquet_id=bouquet_id, quantity=quantity,
+                             price=from_minor_units(price))
+                    for bouquet_id, (quantity, price) in items.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['cart', 'bouquet'],
+                update_fields=['quantity', 'price', 'updated_at'],
+            )
+        if removed_ids:
+            CartItem.objects.filter(cart_id=cart_id, bouquet_id__in=removed_ids).delete()
+        # Кэш обновляем после сигналов post_delete, которые его сбрасывают
+        transaction.on_commit(lambda: _remember(user_id, cart_id, items))
+    return cart_id
+
+
+def close_user_cart(user_id, cart_id, status='ordered'):
+    """Переводит корзину в указанный статус; следующая покупка начнётся с новой корзины."""
+    if cart_id is not None:
+        CartModel.objects.filter(pk=cart_id).update(status=status)
+    _remember(user_id, None, {})
+
+
+def merge_carts(items, other):
+    """Добавляет позиции other к items; у совпадающих букетов количество складывается."""
+    for bouquet_id, (quantity, price) in other.items():
+        if bouquet_id in items:
+            items[bouquet_id][0] += quantity
+        else:
+            items[bouquet_id] = [quantity, price]
+    return items
@@ -45,14 +45,10 @@ def cart_detail(request):
     cart = Cart(request)
     # Проверяем, есть ли неактивные товары в корзине и удаляем их
     # (лучше делать это при итерации, как в __iter__)
-    active_bouquet_ids = list(Bouquet.objects.filter(id__in=cart.cart.keys(), is_active=True).values_list('id', flat=True))
-    removed_count = 0
-    for bouquet_id in list(cart.cart.keys()): # Итерируемся по копии ключей
-        if int(bouquet_id) not in active_bouquet_ids:
-            del cart.cart[bouquet_id]
-            removed_count += 1
+    bouquet_ids = cart.bouquet_ids()
+    active_bouquet_ids = set(Bouquet.objects.filter(id__in=bouquet_ids, is_active=True).values_list('id', flat=True))
+    removed_count = cart.discard([bouquet_id for bouquet_id in bouquet_ids if bouquet_id not in active_bouquet_ids])
     if removed_count > 0:
-        cart.save()
         messages.warning(request, f"Некоторые товары были удалены из корзины, так как стали недоступны.")
 
     return render(request, 'cart/cart_detail.html', {'cart': cart}) # Передаем сам объект cart
\ No newline at end of file
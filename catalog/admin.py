@@ -8,11 +8,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 from django.template.response import TemplateResponse
 
+from .images import thumbnail_url
 from .models import (
     Flower, Ribbon, Wrapper,
     BouquetFlower, BouquetRibbon, BouquetWrapper,
     StockFlower, StockRibbon, StockWrapper,
-    Bouquet
+    Bouquet, Tag
 )
 
 class BouquetStatisticsMixin:
@@ -249,25 +250,33 @@ class BouquetWrapperInline(admin.TabularInline):
 
 @admin.register(Bouquet)
 class BouquetAdmin(BouquetStatisticsMixin, admin.ModelAdmin):
-    list_display = ('name', 'price', 'tag', 'is_active', 'display_image', 'admin_actions')
-    list_filter = ('is_active', 'tag')
-    search_fields = ('name', 'description', 'tag')
+    list_display = ('name', 'price', 'display_tags', 'is_active', 'display_image', 'admin_actions')
+    list_filter = ('is_active', 'tags')
+    search_fields = ('name', 'description', 'tags__name')
     list_editable = ('price', 'is_active')
+    filter_horizontal = ('tags',)
     inlines = [BouquetFlowerInline, BouquetRibbonInline, BouquetWrapperInline]
     list_per_page = 15
     
     fieldsets = (
         (None, {
-            'fields': ('name', 'price', 'description', 'photo', 'tag', 'is_active')
+            'fields': ('name', 'price', 'description', 'photo', 'tags', 'is_active')
         }),
     )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('tags')
+
+    def display_tags(self, obj):
+        return ', '.join(tag.name for tag in obj.tags.all())
+    display_tags.short_description = 'Теги'
     
     def display_image(self, obj):
         if obj and obj.photo:
             try:
                 return format_html(
                     '<img src="{}" style="width:100px; height:100px; object-fit:cover; border-radius:8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" />',
-                    obj.photo.url
+                    thumbnail_url(obj.photo)
                 )
             except Exception as e:
                 return format_html('<span class="error">Ошибка загрузки фото: {}</span>', str(e))
@@ -298,6 +307,19 @@ class BouquetAdmin(BouquetStatisticsMixin, admin.ModelAdmin):
         )
     admin_actions.short_description = 'Actions'
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'bouquet_count')
+    search_fields = ('name',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(bouquet_count=Count('bouquets'))
+
+    def bouquet_count(self, obj):
+        return obj.bouquet_count
+    bouquet_count.short_description = 'Букетов'
+    bouquet_count.admin_order_field = 'bouquet_count'
+
 @admin.register(Flower)
 class FlowerAdmin(admin.ModelAdmin):
     list_display = ('name', 'price', 'display_photo', 'admin_actions')
@@ -310,7 +332,7 @@ class FlowerAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="max-width: 100px; height: auto; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" />',
-                obj.photo.url
+                thumbnail_url(obj.photo)
             )
         return format_html('<span class="text-muted">Нет фото</span>')
     display_photo.short_description = 'Фото'
@@ -336,7 +358,7 @@ class RibbonAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="max-width: 100px; height: auto; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" />',
-                obj.photo.url
+                thumbnail_url(obj.photo)
             )
         return format_html('<span class="text-muted">Нет фото</span>')
     display_photo.short_description = 'Фото'
@@ -362,7 +384,7 @@ class WrapperAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="max-width: 100px; height: auto; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" />',
-                obj.photo.url
+                thumbnail_url(obj.photo)
             )
         return format_html('<span class="text-muted">Нет фото</span>')
     display_photo.short_description = 'Фото'
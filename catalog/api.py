@@ -0,0 +1,208 @@
+# catalog/api.py
+# Компактный JSON-API каталога только для чтения (мобильное приложение).
+# Букеты читаются через values() — без создания экземпляров моделей, состав берётся
+# из снимка Bouquet.composition, число запросов не зависит от размера страницы.
+# Поля ответа выбираются параметром ?fields=, страницы листаются курсором
+# (core.pagination.KeysetPaginator).
+import hashlib
+import json
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+from django.urls import reverse
+
+from core.pagination import KeysetPaginator
+from .facets import parse_price, price_filter, search_filter
+from .images import derivatives_ready, derivative_url, DERIVATIVE_WIDTHS
+from .composition import COMPOSITION_PARTS
+from .models import Bouquet, StockFlower, StockRibbon, StockWrapper
+from .tag_index import TAG_MODE_OR, TAG_MODE_AND, get_tag_index
+
+API_FIELDS = (
+    'id', 'name', 'price', 'description', 'photo', 'thumbnail', 'url',
+    'tags', 'composition', 'available',
+)
+# Без ?fields= список отдаёт поля для сетки каталога, карточка букета — все
+LIST_FIELDS = ('id', 'name', 'price', 'thumbnail', 'url', 'available')
+
+# Поля, которые читаются прямо из строки букета
+COLUMN_FIELDS = ('id', 'name', 'price', 'description')
+
+# sort -> порядок; последним идёт id, чтобы курсор однозначно задавал позицию
+API_ORDERINGS = {
+    'name': ('name', 'id'),
+    'price_asc': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Раздел снимка состава -> поле количества
+AMOUNT_FIELDS = {part: amount_field for part, (_, _, amount_field) in COMPOSITION_PARTS.items()}
+# Раздел снимка состава -> (модель склада, поле компонента, поле остатка)
+STOCK_PARTS = {
+    'flowers': (StockFlower, 'flower', 'quantity'),
+    'ribbons': (StockRibbon, 'ribbon', 'length'),
+    'wrappers': (StockWrapper, 'wrapper', 'length'),
+}
+
+
+class ApiError(ValueError):
+    """Некорректные параметры запроса; текст уходит клиенту с кодом 400."""
+
+
+def parse_fields(value, default):
+    if not value:
+        return default
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in API_FIELDS]
+    if unknown or not fields:
+        raise ApiError(f"Unknown fields: {', '.join(unknown) or value}. Allowed: {', '.join(API_FIELDS)}")
+    return fields
+
+
+def parse_limit(value):
+    if not value:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def columns_for(fields):
+    """Колонки букета для values(): описание и снимок состава — только если они нужны."""
+    columns = ['id', 'name', 'price', 'photo']
+    if 'description' in fields:
+        columns.append('description')
+    if 'composition' in fields or 'available' in fields:
+        columns.append('composition')
+    return columns
+
+
+def filtered_bouquets(params):
+    """Активные букеты с теми же фильтрами, что и HTML-каталог (q, tag, tag_mode, min_price, max_price)."""
+    bouquets = Bouquet.objects.filter(is_active=True)
+    query = params.get('q')
+    if query:
+        bouquets = bouquets.filter(search_filter(query))
+    bouquets = bouquets.filter(price_filter(parse_price(params.get('min_price')),
+                                            parse_price(params.get('max_price'))))
+    tags = list(dict.fromkeys(t for t in params.getlist('tag') if t))
+    if tags:
+        tag_mode = TAG_MODE_OR if params.get('tag_mode') == TAG_MODE_OR else TAG_MODE_AND
+        bouquets = bouquets.filter(pk__in=get_tag_index().ids_for(tags, tag_mode))
+    return bouquets
+
+
+def _unavailable(rows):
+    """
+    id букетов, для которых на складе не хватает хотя бы одного компонента.
+    Состав берётся из снимка Bouquet.composition, остатки — одним запросом на вид компонента.
+    """
+    unavailable = set()
+    for part, (model, component, stock_field) in STOCK_PARTS.items():
+        component_ids = {item['id'] for row in rows for item in row['composition'].get(part, [])}
+        if not component_ids:
+            continue
+        stock = dict(
+            model.objects.filter(**{f'{component}_id__in': component_ids, 'status': 'available'})
+            .values(f'{component}_id').annotate(total=Sum(stock_field))
+            .values_list(f'{component}_id', 'total').order_by()
+        )
+        for row in rows:
+            for item in row['composition'].get(part, []):
+                if stock.get(item['id'], 0) < item[AMOUNT_FIELDS[part]]:
+                    unavailable.add(row['id'])
+    return unavailable
+
+
+def _composition(composition):
+    result = {}
+    for part, amount_field in AMOUNT_FIELDS.items():
+        result[part] = [
+            {'id': item['id'], 'name': item['name'], 'price': item['price'], amount_field: item[amount_field]}
+            for item in composition.get(part, [])
+        ]
+    return result
+
+
+def _tags(bouquet_ids):
+    tags = {bouquet_id: [] for bouquet_id in bouquet_ids}
+    rows = (
+        Bouquet.tags.through.objects.filter(bouquet_id__in=bouquet_ids)
+        .values_list('bouquet_id', 'tag__name').order_by('tag__name')
+    )
+    for bouquet_id, name in rows:
+        tags[bouquet_id].append(name)
+    return tags
+
+
+def serialize_bouquets(rows, fields):
+    """Словари из .values() -> список словарей ответа только с полями fields."""
+    bouquet_ids = [row['id'] for row in rows]
+    tags = _tags(bouquet_ids) if 'tags' in fields else None
+    unavailable = _unavailable(rows) if 'available' in fields else None
+
+    items = []
+    for row in rows:
+        item = {}
+        photo = row['photo']
+        for field in fields:
+            if field in COLUMN_FIELDS:
+                item[field] = row[field]
+            elif field == 'photo':
+                item[field] = default_storage.url(photo) if photo else None
+            elif field == 'thumbnail':
+                item[field] = (
+                    derivative_url(photo, DERIVATIVE_WIDTHS[1], 'jpg') if photo and derivatives_ready(photo)
+                    else default_storage.url(photo) if photo else None
+                )
+            elif field == 'url':
+                item[field] = reverse('catalog:bouquet_detail', args=[row['id']])
+            elif field == 'tags':
+                item[field] = tags[row['id']]
+            elif field == 'composition':
+                item[field] = _composition(row['composition'])
+            elif field == 'available':
+                # Букет без состава собрать не из чего
+                item[field] = row['id'] not in unavailable and any(row['composition'].values())
+        items.append(item)
+    return items
+
+
+def bouquet_list_payload(params):
+    fields = parse_fields(params.get('fields'), LIST_FIELDS)
+    limit = parse_limit(params.get('limit'))
+    ordering = API_ORDERINGS.get(params.get('sort') or 'name')
+    if ordering is None:
+        raise ApiError(f"Unknown sort. Allowed: {', '.join(API_ORDERINGS)}")
+
+    paginator = KeysetPaginator(filtered_bouquets(params).values(*columns_for(fields)), limit, ordering)
+    for name in ('after', 'before'):
+        if params.get(name) and paginator.decode_cursor(params[name]) is None:
+            raise ApiError(f'Invalid {name} cursor')
+    page = paginator.get_page(after=params.get('after'), before=params.get('before'))
+    return {
+        'results': serialize_bouquets(page.object_list, fields),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def bouquet_detail_payload(pk, params):
+    """Словарь букета или None, если активного букета с таким id нет."""
+    fields = parse_fields(params.get('fields'), API_FIELDS)
+    rows = list(Bouquet.objects.filter(is_active=True, pk=pk).values(*columns_for(fields)))
+    if not rows:
+        return None
+    return serialize_bouquets(rows, fields)[0]
+
+
+def encode_payload(payload):
+    """Компактный JSON (UTF-8 без \\u-экранирования) и сильный ETag по его содержимому."""
+    body = json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    return body, '"{}"'.format(hashlib.md5(body).hexdigest())
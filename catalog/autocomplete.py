@@ -0,0 +1,125 @@
+# catalog/autocomplete.py
+# Подсказки для строки поиска каталога из отсортированного массива в памяти процесса.
+# Поиск по префиксу — bisect по нормализованным ключам, без обращений к базе.
+# Ключ заводится для начала каждого слова, поэтому "сюр" находит "Романтический сюрприз".
+# Сигналы каталога обновляют записи изменённого объекта на месте; другие процессы
+# замечают смену общей версии каталога и перестраивают массив целиком.
+import threading
+from bisect import bisect_left, insort
+from urllib.parse import urlencode
+
+from django.urls import reverse
+
+from .cache import get_catalog_version
+from .models import Bouquet, Flower, Tag
+
+KIND_BOUQUET = 'bouquet'
+KIND_TAG = 'tag'
+KIND_FLOWER = 'flower'
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 20
+
+
+def normalize(text):
+    """Регистронезависимый ключ: casefold и ё -> е."""
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def _entries(kind, obj_id, label, url):
+    key = normalize(label)
+    words = key.split(' ')
+    entries = []
+    for position in range(len(words)):
+        entries.append((' '.join(words[position:]), position, kind, obj_id, label, url))
+    return entries
+
+
+def bouquet_entries(bouquet):
+    if not bouquet.is_active:
+        return []
+    return _entries(KIND_BOUQUET, bouquet.pk, bouquet.name, bouquet.get_absolute_url())
+
+
+def flower_entries(flower):
+    url = reverse('catalog:bouquet_list') + '?' + urlencode({'q': flower.name})
+    return _entries(KIND_FLOWER, flower.pk, flower.name, url)
+
+
+def tag_entries(tag):
+    url = reverse('catalog:bouquet_list') + '?' + urlencode({'tag': tag.name})
+    return _entries(KIND_TAG, tag.pk, tag.name, url)
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self.version = None
+        self.entries = []
+        self.by_source = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, version):
+        by_source = {}
+        for bouquet in Bouquet.objects.filter(is_active=True).only('id', 'name', 'is_active'):
+            by_source[(KIND_BOUQUET, bouquet.pk)] = bouquet_entries(bouquet)
+        for tag in Tag.objects.all():
+            by_source[(KIND_TAG, tag.pk)] = tag_entries(tag)
+        for flower in Flower.objects.only('id', 'name'):
+            by_source[(KIND_FLOWER, flower.pk)] = flower_entries(flower)
+        # Читатели всегда видят целый список: он заменяется одной операцией присваивания
+        self.entries = sorted(entry for entries in by_source.values() for entry in entries)
+        self.by_source = by_source
+        self.version = version
+
+    def ensure_current(self):
+        version = get_catalog_version()
+        # Без общей версии изменения из других процессов не видны — индекс строится заново
+        if version is None or self.version != version:
+            with self._lock:
+                if version is None or self.version != version:
+                    self.rebuild(version)
+        return self
+
+    def replace_source(self, kind, obj_id, new_entries):
+        """Заменяет записи одного объекта (пустой список — удаление)."""
+        with self._lock:
+            if self.version is None:
+                # Индекс ещё не строился — соберётся целиком при первом запросе
+                return
+            entries = list(self.entries)
+            for entry in self.by_source.pop((kind, obj_id), []):
+                index = bisect_left(entries, entry)
+                if index < len(entries) and entries[index] == entry:
+                    del entries[index]
+            for entry in new_entries:
+                insort(entries, entry)
+            if new_entries:
+                self.by_source[(kind, obj_id)] = new_entries
+            self.entries = entries
+            self.version = get_catalog_version()
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        key = normalize(prefix)
+        if not key:
+            return []
+        entries = self.entries
+        seen = set()
+        candidates = []
+        index = bisect_left(entries, (key,))
+        # Берём кандидатов с запасом, чтобы совпадения с начала названия шли первыми
+        while index < len(entries) and entries[index][0].startswith(key) and len(candidates) < limit * 3:
+            _, position, kind, obj_id, label, url = entries[index]
+            index += 1
+            if (kind, obj_id) in seen:
+                continue
+            seen.add((kind, obj_id))
+            candidates.append((position, {'label': label, 'kind': kind, 'url': url}))
+        candidates.sort(key=lambda candidate: candidate[0] > 0)
+        return [suggestion for _, suggestion in candidates[:limit]]
+
+
+suggestion_index = SuggestionIndex()
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    return suggestion_index.ensure_current().suggest(prefix, limit)
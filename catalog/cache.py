@@ -0,0 +1,116 @@
+# catalog/cache.py
+# Кэш отрендеренных карточек букетов для сетки каталога.
+# Каждая карточка хранится под ключом букета вместе с его версией; сигналы из
+# catalog/signals.py меняют версию при изменении букета, его состава или фото,
+# и устаревшая карточка просто перестаёт совпадать по версии.
+# Версии сбрасывает процесс, изменивший каталог, поэтому без общего кэша
+# (SHARED_CACHE) кэши каталога не используются.
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.backends.utils import csrf_input
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'catalog/_bouquet_card.html'
+
+# CSRF-токен у каждого пользователя свой, поэтому в кэш карточка попадает с меткой,
+# а настоящее поле формы подставляется при сборке страницы
+CSRF_PLACEHOLDER = '<!--csrf-input-->'
+
+
+# Общая версия каталога (мс с эпохи) — для кэша целых страниц и ETag/Last-Modified
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def version_key(bouquet_id):
+    return f'catalog:bouquet:{bouquet_id}:version'
+
+
+def card_key(bouquet_id):
+    return f'catalog:bouquet:{bouquet_id}:card'
+
+
+def bump_bouquet_version(bouquet_id):
+    """Помечает карточку букета устаревшей."""
+    cache.set(version_key(bouquet_id), uuid.uuid4().hex, timeout=None)
+
+
+def bump_bouquet_versions(bouquet_ids):
+    """Помечает устаревшими карточки нескольких букетов одним set_many."""
+    cache.set_many({version_key(bouquet_id): uuid.uuid4().hex for bouquet_id in bouquet_ids}, timeout=None)
+
+
+def get_catalog_version():
+    """Общая версия каталога или None, если кэш не общий и версии сравнивать нельзя."""
+    if not settings.SHARED_CACHE:
+        return None
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Версия вытеснена или ещё не создавалась: начинаем с текущего времени,
+        # это заведомо новее всех ранее выданных ETag
+        version = time.time_ns() // 1_000_000
+        if not cache.add(CATALOG_VERSION_KEY, version, timeout=None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    """Помечает устаревшими все закэшированные страницы каталога."""
+    previous = cache.get(CATALOG_VERSION_KEY) or 0
+    cache.set(CATALOG_VERSION_KEY, max(time.time_ns() // 1_000_000, previous + 1), timeout=None)
+
+
+def render_card(bouquet):
+    return render_to_string(CARD_TEMPLATE, {
+        'bouquet': bouquet,
+        'csrf_input': mark_safe(CSRF_PLACEHOLDER),
+    })
+
+
+def render_bouquet_cards(request, bouquets):
+    """Возвращает HTML карточек для переданных букетов в том же порядке."""
+    if settings.SHARED_CACHE:
+        cards = _cached_cards(list(bouquets))
+    else:
+        cards = [render_card(bouquet) for bouquet in bouquets]
+    token_input = str(csrf_input(request))
+    return [mark_safe(html.replace(CSRF_PLACEHOLDER, token_input)) for html in cards]
+
+
+def _cached_cards(bouquets):
+    """
+    Версии и карточки всех букетов страницы читаются одним get_many,
+    недостающие карточки рендерятся и записываются одним set_many.
+    """
+    keys = []
+    for bouquet in bouquets:
+        keys.extend((version_key(bouquet.id), card_key(bouquet.id)))
+    cached = cache.get_many(keys)
+
+    new_cards = {}
+    cards = []
+    for bouquet in bouquets:
+        version = cached.get(version_key(bouquet.id))
+        entry = cached.get(card_key(bouquet.id))
+        if version is not None and entry is not None and entry[0] == version:
+            cards.append(entry[1])
+            continue
+
+        if version is None:
+            # Версия вытеснена из кэша или ещё не создавалась — заводим новую,
+            # чтобы карточка с прежней версией гарантированно не совпала
+            # (add не перезапишет версию, если её только что выставил сигнал)
+            version = uuid.uuid4().hex
+            if not cache.add(version_key(bouquet.id), version, timeout=None):
+                version = None
+        html = render_card(bouquet)
+        if version is not None:
+            new_cards[card_key(bouquet.id)] = (version, html)
+        cards.append(html)
+
+    if new_cards:
+        cache.set_many(new_cards, timeout=settings.CATALOG_CARD_CACHE_TIMEOUT)
+    return cards
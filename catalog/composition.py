@@ -0,0 +1,57 @@
+# catalog/composition.py
+# Денормализованный снимок состава букета в Bouquet.composition: компоненты с именами,
+# ценами, фото и количествами. Страница букета, заказ и списание со склада читают состав
+# из строки букета вместо обхода flower_items/ribbon_items/wrapper_items.
+# Снимок пересобирается сигналами (catalog/signals.py) при изменении связей и компонентов,
+# Bouquet.composition_version растёт с каждой пересборкой.
+from django.db.models import F
+
+from .models import Bouquet, BouquetFlower, BouquetRibbon, BouquetWrapper
+
+# Раздел снимка -> (модель связи, поле компонента, поле количества)
+COMPOSITION_PARTS = {
+    'flowers': (BouquetFlower, 'flower', 'quantity'),
+    'ribbons': (BouquetRibbon, 'ribbon', 'length'),
+    'wrappers': (BouquetWrapper, 'wrapper', 'length'),
+}
+
+
+def empty_composition():
+    return {part: [] for part in COMPOSITION_PARTS}
+
+
+def build_compositions(bouquet_ids):
+    """{bouquet_id: снимок} — по одному запросу на вид компонента."""
+    compositions = {bouquet_id: empty_composition() for bouquet_id in bouquet_ids}
+    for part, (model, component, amount_field) in COMPOSITION_PARTS.items():
+        rows = (
+            model.objects.filter(bouquet_id__in=list(compositions))
+            .values_list(
+                'bouquet_id', f'{component}_id', f'{component}__name', f'{component}__price',
+                f'{component}__photo', f'{component}__description', amount_field,
+            )
+            .order_by('id')
+        )
+        for bouquet_id, component_id, name, price, photo, description, amount in rows:
+            compositions[bouquet_id][part].append({
+                'id': component_id,
+                'name': name,
+                'price': str(price),
+                'photo': photo or '',
+                'description': description,
+                amount_field: amount,
+            })
+    return compositions
+
+
+def refresh_compositions(bouquet_ids):
+    """Пересобирает снимки букетов. update() не вызывает сигналы Bouquet и не трогает другие поля."""
+    for bouquet_id, composition in build_compositions(set(bouquet_ids)).items():
+        Bouquet.objects.filter(pk=bouquet_id).update(
+            composition=composition, composition_version=F('composition_version') + 1
+        )
+
+
+def bouquet_ids_with(part, component_id):
+    model, component, _ = COMPOSITION_PARTS[part]
+    return model.objects.filter(**{f'{component}_id': component_id}).values_list('bouquet_id', flat=True)
@@ -0,0 +1,120 @@
+# catalog/facets.py
+# Фасеты фильтров каталога: число букетов по тегам и гистограмма по ценовым диапазонам
+# для текущего поиска и фильтров. Считается одним запросом (id и цены букетов) и
+# индексом тегов в памяти, результат кэшируется по сигнатуре фильтров и общей версии каталога.
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .cache import get_catalog_version
+from .models import Bouquet
+from .tag_index import get_tag_index
+
+# Границы ценовых диапазонов, руб.: [нижняя, верхняя)
+PRICE_BUCKETS = (
+    (None, Decimal('2000')),
+    (Decimal('2000'), Decimal('2500')),
+    (Decimal('2500'), Decimal('3000')),
+    (Decimal('3000'), None),
+)
+# Цены хранятся с копейками, поэтому верхняя граница ссылки — на копейку меньше
+PRICE_STEP = Decimal('0.01')
+
+
+def parse_price(value):
+    """Цена из GET-параметра или None, если параметр пустой или некорректный."""
+    if not value:
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        return None
+    return price if price.is_finite() else None
+
+
+def search_filter(query):
+    # Подзапрос по pk вместо JOIN с составом: строки букетов не размножаются
+    matching = Bouquet.objects.filter(
+        Q(name__icontains=query) |
+        Q(description__icontains=query) |
+        Q(flower_items__flower__name__icontains=query) |
+        Q(tags__name__icontains=query)
+    ).values('pk')
+    return Q(pk__in=matching)
+
+
+def price_filter(min_price, max_price):
+    condition = Q()
+    if min_price is not None:
+        condition &= Q(price__gte=min_price)
+    if max_price is not None:
+        condition &= Q(price__lte=max_price)
+    return condition
+
+
+def in_range(price, low, high, inclusive_high=False):
+    if low is not None and price < low:
+        return False
+    if high is not None and (price > high if inclusive_high else price >= high):
+        return False
+    return True
+
+
+def compute_facets(query, tags, tag_mode, min_price, max_price):
+    """
+    Фасет тегов учитывает поиск и цену, но не выбранные теги; гистограмма цен —
+    поиск и теги, но не выбранную цену. Из базы читаются только (id, цена)
+    подходящих под поиск букетов, теги берутся из индекса в памяти.
+    """
+    bouquets = Bouquet.objects.filter(is_active=True)
+    if query:
+        bouquets = bouquets.filter(search_filter(query))
+    rows = list(bouquets.order_by().values_list('pk', 'price'))
+    index = get_tag_index()
+
+    price_matching = {
+        pk for pk, price in rows if in_range(price, min_price, max_price, inclusive_high=True)
+    }
+    tag_counts = []
+    for name in index.tag_names():
+        count = len(index.bouquet_ids[name] & price_matching)
+        if count or name in tags:
+            tag_counts.append((name, count))
+
+    if tags:
+        tag_matching = index.ids_for(tags, tag_mode)
+        rows = [(pk, price) for pk, price in rows if pk in tag_matching]
+    price_buckets = []
+    for low, high in PRICE_BUCKETS:
+        price_buckets.append({
+            'min_price': str(low) if low is not None else '',
+            'max_price': str(high - PRICE_STEP) if high is not None else '',
+            'label': _bucket_label(low, high),
+            'count': sum(1 for _, price in rows if in_range(price, low, high)),
+        })
+    return {'tags': tag_counts, 'price_buckets': price_buckets}
+
+
+def _bucket_label(low, high):
+    if low is None:
+        return f'до {high:.0f} ₽'
+    if high is None:
+        return f'от {low:.0f} ₽'
+    return f'{low:.0f}–{high:.0f} ₽'
+
+
+def get_facets(query, tags, tag_mode, min_price, max_price):
+    version = get_catalog_version()
+    if version is None:
+        return compute_facets(query, tags, tag_mode, min_price, max_price)
+    signature = json.dumps([query or '', sorted(tags), tag_mode, str(min_price), str(max_price)])
+    key = 'catalog:facets:{}:{}'.format(version, hashlib.md5(signature.encode()).hexdigest())
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(query, tags, tag_mode, min_price, max_price)
+        cache.set(key, facets, timeout=settings.CATALOG_FACET_CACHE_TIMEOUT)
+    return facets
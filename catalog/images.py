@@ -0,0 +1,138 @@
+# catalog/images.py
+# Производные изображения (уменьшенные копии в JPEG и WebP) для фото букетов и компонентов.
+# Копии лежат рядом с оригиналами в MEDIA_ROOT/derivatives/<имя оригинала>/<ширина>.<формат>,
+# поэтому их адреса вычисляются из имени файла без дополнительных полей в моделях.
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'derivatives'
+DERIVATIVE_WIDTHS = (200, 400, 800)
+# Расширение файла -> (формат Pillow, параметры сохранения)
+DERIVATIVE_FORMATS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+# Сколько секунд помнить, что копий ещё нет: их создаёт фоновый поток, возможно, в другом процессе
+PENDING_CHECK_TIMEOUT = 60
+
+_executor = None
+# Файлы, копии которых уже есть. Готовый набор не пропадает, поэтому ответ
+# запоминается на всё время жизни процесса
+_ready_names = set()
+
+
+def derivative_name(name, width, ext):
+    return f'{DERIVATIVES_DIR}/{name}/{width}.{ext}'
+
+
+def _pending_key(name):
+    return 'images:pending:' + hashlib.md5(name.encode()).hexdigest()
+
+
+def derivatives_ready(name):
+    """
+    Готовы ли копии файла name. Хранилище проверяется не чаще раза в PENDING_CHECK_TIMEOUT
+    секунд на файл, пока копий нет, и больше не проверяется, когда они появились.
+    """
+    if name in _ready_names:
+        return True
+    if cache.get(_pending_key(name)):
+        return False
+    # Самая большая WebP-копия записывается последней, её наличие означает готовый набор
+    if default_storage.exists(derivative_name(name, DERIVATIVE_WIDTHS[-1], 'webp')):
+        _ready_names.add(name)
+        return True
+    cache.set(_pending_key(name), True, PENDING_CHECK_TIMEOUT)
+    return False
+
+
+def derivative_url(name, width, ext):
+    return default_storage.url(derivative_name(name, width, ext))
+
+
+def thumbnail_url(image, width=DERIVATIVE_WIDTHS[0]):
+    """
+    Адрес JPEG-копии нужной ширины или оригинала, если копий ещё нет.
+    image — поле ImageField или имя файла (например, из снимка состава букета).
+    """
+    if not image:
+        return ''
+    name = getattr(image, 'name', image)
+    if derivatives_ready(name):
+        return derivative_url(name, int(width), 'jpg')
+    return default_storage.url(name)
+
+
+def generate_derivatives(name, force=False):
+    """
+    Создаёт все копии для файла name из default_storage. Меньшие оригиналы не
+    увеличиваются: копия получает размер оригинала. Возвращает число записанных файлов.
+    """
+    if not force and derivatives_ready(name):
+        return 0
+
+    with default_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image.load()
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+    written = 0
+    for width in DERIVATIVE_WIDTHS:
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        for ext, (image_format, save_options) in DERIVATIVE_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **save_options)
+            target = derivative_name(name, width, ext)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+            written += 1
+    _ready_names.add(name)
+    cache.delete(_pending_key(name))
+    return written
+
+
+def _generate_in_background(name, bouquet_id):
+    from .cache import bump_bouquet_version, bump_catalog_version
+
+    try:
+        generate_derivatives(name)
+    except Exception:
+        logger.exception("Не удалось создать копии изображения %s", name)
+        return
+    # Закэшированные карточки и страницы отрисованы без srcset — сбрасываем их
+    if bouquet_id is not None:
+        bump_bouquet_version(bouquet_id)
+    bump_catalog_version()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_DERIVATIVE_WORKERS, thread_name_prefix='image-derivatives'
+        )
+    return _executor
+
+
+def schedule_derivatives(image_field, bouquet_id=None):
+    """Ставит создание копий в фоновый пул после фиксации транзакции."""
+    if not image_field or derivatives_ready(image_field.name):
+        return
+    name = image_field.name
+    transaction.on_commit(lambda: get_executor().submit(_generate_in_background, name, bouquet_id))
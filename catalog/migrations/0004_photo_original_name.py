@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_alter_stockflower_options_alter_stockribbon_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bouquet',
+            name='photo_original_name',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Original photo name'),
+        ),
+        migrations.AddField(
+            model_name='flower',
+            name='photo_original_name',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Original photo name'),
+        ),
+        migrations.AddField(
+            model_name='ribbon',
+            name='photo_original_name',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Original photo name'),
+        ),
+        migrations.AddField(
+            model_name='wrapper',
+            name='photo_original_name',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Original photo name'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_photo_original_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Name')),
+            ],
+            options={
+                'verbose_name': 'Tag',
+                'verbose_name_plural': 'Tags',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='bouquet',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='bouquets', to='catalog.tag', verbose_name='Tags'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Переносит текстовое поле Bouquet.tag в модель Tag. Строки вида
+# "любовь, весна; лето" разбиваются на отдельные теги, одинаковые без учёта
+# регистра имена сводятся к одному тегу.
+
+from django.db import migrations
+
+
+def split_names(value):
+    names = []
+    for part in (value or '').replace(';', ',').split(','):
+        name = part.strip()
+        if name and name.lower() not in (n.lower() for n in names):
+            names.append(name)
+    return names
+
+
+def split_tags(apps, schema_editor):
+    Bouquet = apps.get_model('catalog', 'Bouquet')
+    Tag = apps.get_model('catalog', 'Tag')
+    Through = Bouquet.tags.through
+
+    tags_by_lower = {}
+    links = []
+    for bouquet_id, value in Bouquet.objects.values_list('id', 'tag').iterator():
+        for name in split_names(value):
+            tag = tags_by_lower.get(name.lower())
+            if tag is None:
+                tag = tags_by_lower[name.lower()] = Tag.objects.create(name=name)
+            links.append(Through(bouquet_id=bouquet_id, tag_id=tag.id))
+    Through.objects.bulk_create(links, batch_size=1000)
+
+
+def join_tags(apps, schema_editor):
+    Bouquet = apps.get_model('catalog', 'Bouquet')
+    for bouquet in Bouquet.objects.prefetch_related('tags'):
+        bouquet.tag = ', '.join(tag.name for tag in bouquet.tags.all())[:100]
+        bouquet.save(update_fields=['tag'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_tag'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_tags, join_tags),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_split_bouquet_tags'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='bouquet',
+            name='tag',
+        ),
+    ]
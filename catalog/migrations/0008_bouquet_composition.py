@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_remove_bouquet_tag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bouquet',
+            name='composition',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Composition'),
+        ),
+        migrations.AddField(
+            model_name='bouquet',
+            name='composition_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Composition version'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Заполняет Bouquet.composition для существующих букетов.
+# Копия catalog.composition.build_compositions на исторических моделях.
+
+from django.db import migrations
+
+PARTS = {
+    'flowers': ('BouquetFlower', 'flower', 'quantity'),
+    'ribbons': ('BouquetRibbon', 'ribbon', 'length'),
+    'wrappers': ('BouquetWrapper', 'wrapper', 'length'),
+}
+
+
+def fill_compositions(apps, schema_editor):
+    Bouquet = apps.get_model('catalog', 'Bouquet')
+    compositions = {
+        bouquet_id: {part: [] for part in PARTS}
+        for bouquet_id in Bouquet.objects.values_list('id', flat=True)
+    }
+    for part, (model_name, component, amount_field) in PARTS.items():
+        rows = apps.get_model('catalog', model_name).objects.values_list(
+            'bouquet_id', f'{component}_id', f'{component}__name', f'{component}__price',
+            f'{component}__photo', f'{component}__description', amount_field,
+        ).order_by('id')
+        for bouquet_id, component_id, name, price, photo, description, amount in rows.iterator():
+            compositions[bouquet_id][part].append({
+                'id': component_id,
+                'name': name,
+                'price': str(price),
+                'photo': photo or '',
+                'description': description,
+                amount_field: amount,
+            })
+    for bouquet_id, composition in compositions.items():
+        Bouquet.objects.filter(pk=bouquet_id).update(composition=composition, composition_version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_bouquet_composition'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_compositions, migrations.RunPython.noop),
+    ]
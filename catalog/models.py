@@ -2,13 +2,39 @@ from django.db import models
 from django.urls import reverse
 from django.core.exceptions import ValidationError
 
+class Tag(models.Model):
+    name = models.CharField("Name", max_length=100, unique=True)
+
+    class Meta:
+        verbose_name = "Tag"
+        verbose_name_plural = "Tags"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def split_names(value):
+        """Разбивает строку тегов ("любовь, весна; лето") на уникальные имена."""
+        names = []
+        for part in value.replace(';', ',').split(','):
+            name = part.strip()
+            if name and name.lower() not in (n.lower() for n in names):
+                names.append(name)
+        return names
+
 class Bouquet(models.Model):
     name = models.CharField("Name", max_length=100)
     price = models.DecimalField("Price", max_digits=10, decimal_places=2)
     description = models.TextField("Description")
     photo = models.ImageField("Photo", upload_to="bouquets/", blank=True, null=True)
-    tag = models.CharField("Tag", max_length=100)
+    # Имя загруженного файла; сам файл хранится под хэшем содержимого
+    photo_original_name = models.CharField("Original photo name", max_length=255, blank=True, editable=False)
+    tags = models.ManyToManyField('Tag', related_name='bouquets', blank=True, verbose_name="Tags")
     is_active = models.BooleanField("Active", default=True)
+    # Снимок состава (компоненты, цены, количества), поддерживается сигналами — см. catalog/composition.py
+    composition = models.JSONField("Composition", default=dict, blank=True, editable=False)
+    composition_version = models.PositiveIntegerField("Composition version", default=0, editable=False)
     
     flowers = models.ManyToManyField('Flower', through='BouquetFlower', related_name='bouquets')
     ribbons = models.ManyToManyField('Ribbon', through='BouquetRibbon', related_name='bouquets')
@@ -25,6 +51,16 @@ class Bouquet(models.Model):
     def get_absolute_url(self):
         return reverse('catalog:bouquet_detail', args=[str(self.id)])
 
+    def save(self, *args, **kwargs):
+        # Снимок состава пишет только catalog.composition: сохранение загруженного
+        # ранее экземпляра не должно затирать его устаревшей копией
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('composition', 'composition_version')
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def flower_items(self):
         return self.bouquetflower_set.all()
@@ -42,6 +78,8 @@ class Flower(models.Model):
     price = models.DecimalField("Price", max_digits=10, decimal_places=2)
     description = models.TextField("Description")
     photo = models.ImageField("Photo", upload_to="flowers/", blank=True, null=True)
+    # Имя загруженного файла; сам файл хранится под хэшем содержимого
+    photo_original_name = models.CharField("Original photo name", max_length=255, blank=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -60,6 +98,8 @@ class Ribbon(models.Model):
     price = models.DecimalField("Price", max_digits=10, decimal_places=2)
     description = models.TextField("Description")
     photo = models.ImageField("Photo", upload_to="ribbons/", blank=True, null=True)
+    # Имя загруженного файла; сам файл хранится под хэшем содержимого
+    photo_original_name = models.CharField("Original photo name", max_length=255, blank=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -78,6 +118,8 @@ class Wrapper(models.Model):
     price = models.DecimalField("Price", max_digits=10, decimal_places=2)
     description = models.TextField("Description")
     photo = models.ImageField("Photo", upload_to="wrappers/", blank=True, null=True)
+    # Имя загруженного файла; сам файл хранится под хэшем содержимого
+    photo_original_name = models.CharField("Original photo name", max_length=255, blank=True, editable=False)
 
     def __str__(self):
         return self.name
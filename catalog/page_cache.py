@@ -0,0 +1,99 @@
+# catalog/page_cache.py
+# Кэш целых страниц каталога для анонимных посетителей с пустой корзиной.
+# Ключ строится из пути, нормализованной строки запроса и общей версии каталога,
+# она же даёт ETag/Last-Modified для ответов 304.
+import hashlib
+import re
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache import get_catalog_version
+
+# Параметры, от которых зависит страница; с любыми другими кэш не используется
+PAGE_CACHE_PARAMS = frozenset({'q', 'tag', 'tag_mode', 'min_price', 'max_price', 'sort', 'page'})
+
+# CSRF-токены из сохранённой страницы заменяются токеном текущего посетителя
+CSRF_TOKEN_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_TOKEN_PLACEHOLDER = '__csrf_token__'
+
+
+def normalized_query(request):
+    """Строка запроса с отсортированными непустыми параметрами или None, если есть посторонние."""
+    if not PAGE_CACHE_PARAMS.issuperset(request.GET):
+        return None
+    return urlencode(sorted(
+        (key, value) for key in request.GET for value in request.GET.getlist(key) if value != ''
+    ))
+
+
+def is_page_cacheable(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    if request.session.get(settings.CART_SESSION_ID):
+        return False
+    # Непоказанные сообщения выводятся в base.html, такую страницу кэшировать нельзя
+    return not len(messages.get_messages(request))
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Браузер хранит страницу, но каждый раз сверяет её с сервером; общим кэшам
+    # страницу с CSRF-токеном отдавать нельзя
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def anonymous_page_cache(view_func):
+    """
+    Отдаёт анонимным посетителям без корзины сохранённую страницу или 304.
+    Авторизованные пользователи и посетители с товарами в корзине идут мимо кэша.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        query = normalized_query(request)
+        if query is None or not is_page_cacheable(request):
+            return view_func(request, *args, **kwargs)
+
+        version = get_catalog_version()
+        if version is None:
+            return view_func(request, *args, **kwargs)
+        digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+        etag = f'"{version}-{digest}"'
+        last_modified = version // 1000
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
+
+        key = f'catalog:page:{version}:{digest}'
+        cached = cache.get(key)
+        if cached is not None:
+            content_type, content = cached
+            response = HttpResponse(
+                content.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request)),
+                content_type=content_type,
+            )
+            return set_validators(response, etag, last_modified)
+
+        response = view_func(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+        content = CSRF_TOKEN_RE.sub(
+            rf'\g<1>{CSRF_TOKEN_PLACEHOLDER}\g<2>', response.content.decode(response.charset)
+        )
+        cache.set(key, (response['Content-Type'], content), timeout=settings.CATALOG_PAGE_CACHE_TIMEOUT)
+        return set_validators(response, etag, last_modified)
+
+    return _wrapped_view
@@ -0,0 +1,129 @@
+# catalog/pricing.py
+# Массовая переоценка букетов по стоимости состава.
+# Себестоимость всех букетов считается одним запросом (по коррелированному подзапросу
+# на вид компонента), новые цены — по правилу наценки и округления, а записываются
+# UPDATE ... FROM пачками по REPRICING_CHUNK_SIZE в одной транзакции. Сигналы при
+# этом не вызываются, поэтому кэши каталога сбрасываются один раз в конце
+# (см. apply_repricing).
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .cache import bump_bouquet_versions, bump_catalog_version
+from .models import Bouquet, BouquetFlower, BouquetRibbon, BouquetWrapper
+
+ROUNDING_MODES = {
+    'up': ROUND_CEILING,
+    'down': ROUND_FLOOR,
+    'nearest': ROUND_HALF_UP,
+}
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+# Длины лент и упаковки хранятся во FloatField; перед умножением на цену приводим к decimal
+AMOUNT = DecimalField(max_digits=10, decimal_places=3)
+
+# Букетов в одном UPDATE: SQLite допускает не больше 500 SELECT в UNION ALL,
+# PostgreSQL — не больше 65535 параметров запроса
+REPRICING_CHUNK_SIZE = 200
+
+# Модель связи -> (поле компонента, поле количества)
+COST_PARTS = (
+    (BouquetFlower, 'flower', 'quantity'),
+    (BouquetRibbon, 'ribbon', 'length'),
+    (BouquetWrapper, 'wrapper', 'length'),
+)
+
+
+class RepricingRule:
+    """Цена = себестоимость × (1 + margin_percent / 100), округлённая до кратного step."""
+
+    def __init__(self, margin_percent, step=Decimal('1'), rounding='up'):
+        if rounding not in ROUNDING_MODES:
+            raise ValueError(f"Unknown rounding mode: {rounding}")
+        self.margin_percent = Decimal(margin_percent)
+        self.step = Decimal(step)
+        if self.step <= 0:
+            raise ValueError('Rounding step must be positive')
+        self.rounding = rounding
+
+    def price_for(self, cost):
+        raw = cost * (1 + self.margin_percent / 100)
+        steps = (raw / self.step).to_integral_value(rounding=ROUNDING_MODES[self.rounding])
+        return (steps * self.step).quantize(Decimal('0.01'))
+
+
+def _part_cost(model, component, amount_field):
+    per_bouquet = (
+        model.objects.filter(bouquet_id=OuterRef('pk'))
+        .order_by().values('bouquet_id')
+        .annotate(total=Sum(Cast(amount_field, AMOUNT) * F(f'{component}__price'), output_field=MONEY))
+        .values('total')
+    )
+    return Coalesce(Subquery(per_bouquet, output_field=MONEY), Value(Decimal('0')), output_field=MONEY)
+
+
+def bouquet_costs(bouquets=None):
+    """(id, название, текущая цена, себестоимость) букетов с непустым составом — один запрос."""
+    bouquets = Bouquet.objects.all() if bouquets is None else bouquets
+    flowers, ribbons, wrappers = (_part_cost(*part) for part in COST_PARTS)
+    cost = flowers + ribbons + wrappers
+    return (
+        bouquets.annotate(cost=cost).filter(cost__gt=0)
+        .order_by('pk').values_list('pk', 'name', 'price', 'cost')
+    )
+
+
+def preview_repricing(rule, bouquets=None):
+    """
+    Список изменений без записи в базу: словари с id, name, old_price, cost, new_price.
+    Букеты, цена которых не меняется, не попадают в список.
+    """
+    changes = []
+    for pk, name, price, cost in bouquet_costs(bouquets):
+        new_price = rule.price_for(Decimal(cost))
+        if new_price != price:
+            changes.append({
+                'id': pk, 'name': name, 'old_price': price, 'cost': Decimal(cost), 'new_price': new_price,
+            })
+    return changes
+
+
+def _update_prices_sql(count):
+    table = connection.ops.quote_name(Bouquet._meta.db_table)
+    price_column = connection.ops.quote_name(Bouquet._meta.get_field('price').column)
+    pk_column = connection.ops.quote_name(Bouquet._meta.pk.column)
+    # SELECT ... UNION ALL вместо VALUES: SQLite не умеет задавать имена колонкам VALUES
+    rows = ' UNION ALL '.join(['SELECT %s AS id, CAST(%s AS NUMERIC) AS price'] * count)
+    return (
+        f'UPDATE {table} SET {price_column} = new_prices.price '
+        f'FROM ({rows}) AS new_prices '
+        f'WHERE {table}.{pk_column} = new_prices.id'
+    )
+
+
+def apply_repricing(changes):
+    """
+    Записывает новые цены UPDATE-ами по REPRICING_CHUNK_SIZE букетов в одной транзакции
+    и один раз сбрасывает кэши каталога.
+    """
+    if not changes:
+        return 0
+    updated = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for start in range(0, len(changes), REPRICING_CHUNK_SIZE):
+                chunk = changes[start:start + REPRICING_CHUNK_SIZE]
+                params = [value for change in chunk for value in (change['id'], change['new_price'])]
+                cursor.execute(_update_prices_sql(len(chunk)), params)
+                updated += cursor.rowcount
+        bouquet_ids = [change['id'] for change in changes]
+
+        def invalidate_caches():
+            # Карточки показывают цену; страницы, фасеты и API зависят от общей версии
+            bump_bouquet_versions(bouquet_ids)
+            bump_catalog_version()
+
+        transaction.on_commit(invalidate_caches)
+    return updated
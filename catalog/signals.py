@@ -0,0 +1,127 @@
+# catalog/signals.py
+import os
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import autocomplete
+from .cache import bump_bouquet_version, bump_catalog_version
+from .composition import bouquet_ids_with, refresh_compositions
+from .images import schedule_derivatives
+from .models import Bouquet, BouquetFlower, BouquetRibbon, BouquetWrapper, Flower, Ribbon, Tag, Wrapper
+
+
+# Версии сбрасываются после фиксации транзакции: иначе запрос, попавший между
+# сигналом и COMMIT, прочитает старые строки и закэширует их под новой версией
+def invalidate_after_commit(bouquet_id=None):
+    def invalidate():
+        if bouquet_id is not None:
+            bump_bouquet_version(bouquet_id)
+        bump_catalog_version()
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=Bouquet)
+def invalidate_bouquet_card(sender, instance, **kwargs):
+    # Название, цена, описание и фото хранятся в самом букете
+    invalidate_after_commit(instance.pk)
+
+
+COMPOSITION_PART_BY_MODEL = {Flower: 'flowers', Ribbon: 'ribbons', Wrapper: 'wrappers'}
+
+
+@receiver([post_save, post_delete], sender=BouquetFlower)
+@receiver([post_save, post_delete], sender=BouquetRibbon)
+@receiver([post_save, post_delete], sender=BouquetWrapper)
+def invalidate_bouquet_card_composition(sender, instance, **kwargs):
+    invalidate_after_commit(instance.bouquet_id)
+
+
+@receiver([post_save, post_delete], sender=BouquetFlower)
+@receiver([post_save, post_delete], sender=BouquetRibbon)
+@receiver([post_save, post_delete], sender=BouquetWrapper)
+def refresh_bouquet_composition(sender, instance, origin=None, **kwargs):
+    # При удалении самого букета связи удаляются каскадом, снимок уже не нужен
+    if isinstance(origin, Bouquet):
+        return
+    refresh_compositions([instance.bouquet_id])
+
+
+@receiver(post_save, sender=Flower)
+@receiver(post_save, sender=Ribbon)
+@receiver(post_save, sender=Wrapper)
+def refresh_component_compositions(sender, instance, created, **kwargs):
+    # Имя, цена и фото компонента копируются в снимки букетов; удаление
+    # компонента каскадом удаляет связи и обрабатывается обработчиком выше
+    if created:
+        return
+    part = COMPOSITION_PART_BY_MODEL[sender]
+    refresh_compositions(bouquet_ids_with(part, instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Flower)
+@receiver([post_save, post_delete], sender=Ribbon)
+@receiver([post_save, post_delete], sender=Wrapper)
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_catalog_pages(sender, instance, **kwargs):
+    # Названия и фото компонентов выводятся на странице букета,
+    # теги — в фильтрах и индексе тегов (catalog/tag_index.py)
+    invalidate_after_commit()
+
+
+@receiver(m2m_changed, sender=Bouquet.tags.through)
+def invalidate_bouquet_tags(sender, action, **kwargs):
+    # Карточки теги не выводят, меняются только фильтры и индекс тегов
+    if action.startswith('post_'):
+        invalidate_after_commit()
+
+
+@receiver(post_save, sender=Bouquet)
+@receiver(post_save, sender=Flower)
+@receiver(post_save, sender=Ribbon)
+@receiver(post_save, sender=Wrapper)
+def create_photo_derivatives(sender, instance, **kwargs):
+    # Уменьшенные копии фото создаются в фоне; до готовности шаблоны выводят оригинал
+    schedule_derivatives(instance.photo, bouquet_id=instance.pk if sender is Bouquet else None)
+
+
+@receiver(pre_save, sender=Bouquet)
+@receiver(pre_save, sender=Flower)
+@receiver(pre_save, sender=Ribbon)
+@receiver(pre_save, sender=Wrapper)
+def remember_photo_original_name(sender, instance, **kwargs):
+    # Хранилище заменит имя файла хэшем, исходное имя сохраняем отдельно
+    if instance.photo and not instance.photo._committed:
+        instance.photo_original_name = os.path.basename(instance.photo.name)[:255]
+
+
+# Подсказки поиска обновляются точечно после фиксации транзакции.
+# Эти обработчики подключены после сброса версии каталога выше (on_commit выполняет
+# функции в порядке регистрации), поэтому индекс
+# подсказок запоминает уже новую версию и не перестраивается целиком.
+AUTOCOMPLETE_SOURCES = {
+    Bouquet: (autocomplete.KIND_BOUQUET, autocomplete.bouquet_entries),
+    Flower: (autocomplete.KIND_FLOWER, autocomplete.flower_entries),
+    Tag: (autocomplete.KIND_TAG, autocomplete.tag_entries),
+}
+
+
+@receiver(post_save, sender=Bouquet)
+@receiver(post_save, sender=Flower)
+@receiver(post_save, sender=Tag)
+def update_autocomplete(sender, instance, **kwargs):
+    kind, build_entries = AUTOCOMPLETE_SOURCES[sender]
+    entries = build_entries(instance)
+    transaction.on_commit(
+        lambda: autocomplete.suggestion_index.replace_source(kind, instance.pk, entries)
+    )
+
+
+@receiver(post_delete, sender=Bouquet)
+@receiver(post_delete, sender=Flower)
+@receiver(post_delete, sender=Tag)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    kind, _ = AUTOCOMPLETE_SOURCES[sender]
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.suggestion_index.replace_source(kind, pk, []))
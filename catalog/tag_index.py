@@ -0,0 +1,58 @@
+# catalog/tag_index.py
+# Индекс в памяти процесса: имя тега -> множество id активных букетов.
+# Фильтры по нескольким тегам (И / ИЛИ) считаются пересечением/объединением
+# множеств без JOIN с таблицей связей. Индекс перестраивается одним запросом,
+# когда меняется общая версия каталога (её сбрасывают сигналы catalog/signals.py).
+import threading
+
+from .cache import get_catalog_version
+from .models import Bouquet
+
+TAG_MODE_AND = 'and'
+TAG_MODE_OR = 'or'
+
+
+class TagIndex:
+    def __init__(self):
+        self.version = None
+        self.bouquet_ids = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, version):
+        bouquet_ids = {}
+        rows = Bouquet.tags.through.objects.filter(bouquet__is_active=True).values_list(
+            'tag__name', 'bouquet_id'
+        )
+        for name, bouquet_id in rows:
+            bouquet_ids.setdefault(name, set()).add(bouquet_id)
+        # Заменяем словарь целиком, чтобы параллельные запросы не видели его частично заполненным
+        self.bouquet_ids = {name: frozenset(ids) for name, ids in bouquet_ids.items()}
+        self.version = version
+
+    def ensure_current(self):
+        version = get_catalog_version()
+        # Без общей версии изменения из других процессов не видны — индекс строится заново
+        if version is None or self.version != version:
+            with self._lock:
+                if version is None or self.version != version:
+                    self.rebuild(version)
+        return self
+
+    def tag_names(self):
+        return sorted(self.bouquet_ids)
+
+    def ids_for(self, names, mode=TAG_MODE_AND):
+        """id букетов со всеми (mode='and') или хотя бы одним (mode='or') из тегов."""
+        sets = [self.bouquet_ids.get(name, frozenset()) for name in names]
+        if not sets:
+            return frozenset()
+        if mode == TAG_MODE_OR:
+            return frozenset().union(*sets)
+        return frozenset.intersection(*sets)
+
+
+tag_index = TagIndex()
+
+
+def get_tag_index():
+    return tag_index.ensure_current()
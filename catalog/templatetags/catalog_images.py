@@ -0,0 +1,36 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from catalog.images import DERIVATIVE_WIDTHS, derivative_url, derivatives_ready, thumbnail_url
+
+register = template.Library()
+
+
+def _srcset(name, ext):
+    return ', '.join(f'{derivative_url(name, width, ext)} {width}w' for width in DERIVATIVE_WIDTHS)
+
+
+@register.simple_tag
+def responsive_image(image, alt, css_class='', sizes='100vw', loading='lazy'):
+    """
+    <picture> с WebP и JPEG-копиями разной ширины. Пока копии не готовы,
+    выводит обычный <img> с оригиналом. image — поле ImageField или имя файла.
+    """
+    name = getattr(image, 'name', image)
+    if not derivatives_ready(name):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}">', default_storage.url(name), alt, css_class, loading
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}">'
+        '</picture>',
+        _srcset(name, 'webp'), sizes,
+        derivative_url(name, DERIVATIVE_WIDTHS[1], 'jpg'), _srcset(name, 'jpg'), sizes,
+        alt, css_class, loading,
+    )
+
+
+register.filter('thumbnail_url', thumbnail_url)
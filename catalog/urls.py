@@ -7,4 +7,7 @@ app_name = "catalog"
 urlpatterns = [
     path("", views.bouquet_list_view, name="bouquet_list"),
     path("<int:pk>/", views.bouquet_detail_view, name="bouquet_detail"),
+    path("autocomplete/", views.autocomplete_view, name="autocomplete"),
+    path("api/bouquets/", views.api_bouquet_list, name="api_bouquet_list"),
+    path("api/bouquets/<int:pk>/", views.api_bouquet_detail, name="api_bouquet_detail"),
 ]
@@ -1,44 +1,56 @@
 # catalog/views.py
+from urllib.parse import urlencode
+
 from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views import generic
-from django.db.models import Q
+from . import api, autocomplete
+from .cache import render_bouquet_cards
+from .facets import get_facets, parse_price, price_filter, search_filter
+from .tag_index import TAG_MODE_AND, TAG_MODE_OR, get_tag_index
 from .models import Bouquet
+from .page_cache import anonymous_page_cache
 
 from core.decorators import deny_roles
 
+def filter_querystring(filters, **overrides):
+    """Строка запроса каталога из текущих фильтров с заменёнными значениями, без пустых параметров."""
+    params = dict(filters, **overrides)
+    return urlencode([
+        (key, value) for key, values in params.items()
+        for value in (values if isinstance(values, list) else [values]) if value
+    ])
+
+
+def _toggle_tag(tags, name, tag_mode):
+    selected = [t for t in tags if t != name] if name in tags else tags + [name]
+    return {"tag": selected, "tag_mode": tag_mode if len(selected) > 1 else ""}
+
+
 @deny_roles(["courier", "florist"])
+@anonymous_page_cache
 def bouquet_list_view(request):
     bouquets = Bouquet.objects.filter(is_active=True)
     
     # Search handling
     query = request.GET.get("q")
     if query:
-        bouquets = bouquets.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(flower_items__flower__name__icontains=query) |
-            Q(tag__icontains=query)
-        ).distinct()
+        bouquets = bouquets.filter(search_filter(query))
     
     # Price range filtering
     min_price = request.GET.get("min_price")
     max_price = request.GET.get("max_price")
-    if min_price:
-        try:
-            bouquets = bouquets.filter(price__gte=float(min_price))
-        except ValueError:
-            pass
-    if max_price:
-        try:
-            bouquets = bouquets.filter(price__lte=float(max_price))
-        except ValueError:
-            pass
+    min_price_value = parse_price(min_price)
+    max_price_value = parse_price(max_price)
+    bouquets = bouquets.filter(price_filter(min_price_value, max_price_value))
     
-    # Tag filtering
-    tag = request.GET.get("tag")
-    if tag:
-        bouquets = bouquets.filter(tag=tag)
+    # Tag filtering: несколько ?tag=, режим tag_mode=and|or, id берутся из индекса тегов
+    tags = list(dict.fromkeys(t for t in request.GET.getlist("tag") if t))
+    tag_mode = TAG_MODE_OR if request.GET.get("tag_mode") == TAG_MODE_OR else TAG_MODE_AND
+    if tags:
+        bouquets = bouquets.filter(pk__in=get_tag_index().ids_for(tags, tag_mode))
 
     # Sorting
     sort = request.GET.get("sort")
@@ -55,26 +67,96 @@ def bouquet_list_view(request):
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
     
-    # Get unique tags for filtering
-    all_tags = Bouquet.objects.filter(is_active=True).values_list('tag', flat=True).distinct()
+    # Счётчики для боковой панели фильтров (один запрос, кэшируется)
+    facets = get_facets(query, tags, tag_mode, min_price_value, max_price_value)
+    filters = {
+        "q": query or "", "tag": tags, "tag_mode": tag_mode if len(tags) > 1 else "",
+        "min_price": min_price or "", "max_price": max_price or "", "sort": sort or "",
+    }
     
     context = {
         "page_obj": page_obj,
+        # Карточки собираются из кэша фрагментов (catalog/cache.py)
+        "bouquet_cards": render_bouquet_cards(request, page_obj),
         "current_query": query or "",
         "current_sort": sort or "",
         "current_min_price": min_price or "",
         "current_max_price": max_price or "",
-        "current_tag": tag or "",
-        "all_tags": all_tags,
+        "current_tags": tags,
+        "current_tag_mode": tag_mode,
+        # Готовые строки запроса для ссылок сортировки, тегов и ценовых диапазонов
+        "filter_querystring": filter_querystring(filters, sort=""),
+        "all_tags_querystring": filter_querystring(filters, tag=[], tag_mode=""),
+        "tag_mode_querystrings": {
+            mode: filter_querystring(filters, tag_mode=mode) for mode in (TAG_MODE_AND, TAG_MODE_OR)
+        },
+        "tag_facets": [
+            {
+                "name": name,
+                "count": count,
+                "selected": name in tags,
+                "querystring": filter_querystring(filters, **_toggle_tag(tags, name, tag_mode)),
+            }
+            for name, count in facets["tags"]
+        ],
+        "price_facets": [
+            dict(bucket, querystring=filter_querystring(
+                filters, min_price=bucket["min_price"], max_price=bucket["max_price"]
+            ))
+            for bucket in facets["price_buckets"]
+        ],
     }
     return render(request, "catalog/bouquet_list.html", context)
 
 @deny_roles(["courier", "florist"])
+@anonymous_page_cache
 def bouquet_detail_view(request, pk):
-    bouquet = get_object_or_404(
-        Bouquet.objects.filter(is_active=True).prefetch_related(
-            "flower_items__flower", "ribbon_items__ribbon", "wrapper_items__wrapper"
-        ),
-        pk=pk,
-    )
+    # Состав выводится из снимка Bouquet.composition — одна строка без обхода связей
+    bouquet = get_object_or_404(Bouquet, is_active=True, pk=pk)
     return render(request, "catalog/bouquet_detail.html", {"bouquet": bouquet})
+
+
+def autocomplete_view(request):
+    # Без deny_roles: подсказки публичные, а проверка роли загрузила бы сессию из базы
+    try:
+        limit = min(int(request.GET.get("limit", autocomplete.DEFAULT_LIMIT)), autocomplete.MAX_LIMIT)
+    except ValueError:
+        limit = autocomplete.DEFAULT_LIMIT
+    query = request.GET.get("q", "")
+    response = JsonResponse({
+        "query": query,
+        "suggestions": autocomplete.suggest(query, max(limit, 1)),
+    })
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+def _api_response(request, payload):
+    body, etag = api.encode_payload(payload)
+    # ETag считается по телу: наличие зависит от склада, а не только от версии каталога
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json; charset=utf-8")
+    response["ETag"] = etag
+    # Клиент хранит ответ, но перед использованием сверяет ETag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def api_bouquet_list(request):
+    # Без deny_roles и сессии, как и подсказки поиска
+    try:
+        payload = api.bouquet_list_payload(request.GET)
+    except api.ApiError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    return _api_response(request, payload)
+
+
+def api_bouquet_detail(request, pk):
+    try:
+        payload = api.bouquet_detail_payload(pk, request.GET)
+    except api.ApiError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    if payload is None:
+        return JsonResponse({"status": "error", "message": "Not found"}, status=404)
+    return _api_response(request, payload)
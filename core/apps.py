@@ -55,6 +55,42 @@ class CoreConfig(AppConfig):
             )
             logger.info("Added assign_courier_job to scheduler")
 
+            scheduler.add_job(
+                tasks.sweep_expired_task,
+                trigger='cron',
+                hour=settings.SWEEP_HOUR,  # Ночью, вне рабочего времени магазина
+                id='sweep_expired_job',
+                max_instances=1,
+                replace_existing=True,
+                coalesce=True,
+                misfire_grace_time=3600
+            )
+            logger.info("Added sweep_expired_job to scheduler")
+
+            scheduler.add_job(
+                tasks.process_payments_task,
+                trigger='interval',
+                minutes=1,
+                id='process_payments_job',
+                max_instances=1,
+                replace_existing=True,
+                coalesce=True,
+                misfire_grace_time=60
+            )
+            logger.info("Added process_payments_job to scheduler")
+
+            scheduler.add_job(
+                tasks.apply_payment_events_task,
+                trigger='interval',
+                minutes=1,
+                id='apply_payment_events_job',
+                max_instances=1,
+                replace_existing=True,
+                coalesce=True,
+                misfire_grace_time=60
+            )
+            logger.info("Added apply_payment_events_job to scheduler")
+
             scheduler.start()
             logger.info("Scheduler started successfully")
         except Exception as e:
@@ -1,4 +1,5 @@
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.urls import reverse
@@ -7,15 +8,31 @@ def role_required(allowed_roles):
     if isinstance(allowed_roles, str):
         allowed_roles = [allowed_roles]
 
+    def check_user(request, user):
+        if not user.is_authenticated:
+            messages.error(request, "Для доступа необходимо войти в систему.")
+            return redirect(f"{reverse('users:login')}?next={request.path}")
+        if user.role not in allowed_roles:
+            messages.error(request, "Доступ запрещен. Эта страница не пользователя с этой ролью.")
+            return redirect('catalog:bouquet_list')
+        return None
+
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            # Асинхронные представления: request.user нельзя трогать из async-кода, берём auser()
+            @wraps(view_func)
+            async def _wrapped_async_view(request, *args, **kwargs):
+                denied = check_user(request, await request.auser())
+                if denied:
+                    return denied
+                return await view_func(request, *args, **kwargs)
+            return _wrapped_async_view
+
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
-            if not request.user.is_authenticated:
-                messages.error(request, "Для доступа необходимо войти в систему.")
-                return redirect(f"{reverse('users:login')}?next={request.path}")
-            if request.user.role not in allowed_roles:
-                messages.error(request, "Доступ запрещен. Эта страница не пользователя с этой ролью.")
-                return redirect('catalog:bouquet_list')
+            denied = check_user(request, request.user)
+            if denied:
+                return denied
             return view_func(request, *args, **kwargs)
         return _wrapped_view
     return decorator
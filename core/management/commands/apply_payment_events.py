@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.webhooks import apply_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Applies received payment gateway webhook events to payments and orders in ordered batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            help='Events per batch (default PAYMENT_EVENT_BATCH_SIZE)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new events instead of exiting')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds between polls with --loop (default 1)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        while True:
+            stats = apply_pending_events(options['batch_size'])
+            if stats.events or not options['loop']:
+                self.stdout.write(str(stats))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
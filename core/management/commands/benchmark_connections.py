@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from orders.models import CourierLocation, Order
+from .load_test import percentile
+
+
+class Command(BaseCommand):
+    help = ('Measures the DB cost of courier_update_location per request cycle, including '
+            'connection setup. Run it with DB_POOL=0 and DB_POOL=1 to compare.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        order = Order.objects.filter(status='delivering', courier__isnull=False).first()
+        if order is None:
+            raise CommandError("No orders in 'delivering' status. Run seed_data --scale first.")
+
+        new_connections = []
+        connection_created.connect(lambda sender, **kwargs: new_connections.append(1), weak=False)
+
+        mode = 'pool' if connection.settings_dict['OPTIONS'].get('pool') else (
+            f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']}"
+        )
+        self.stdout.write(f"Benchmarking {options['iterations']} request cycles ({mode})...")
+
+        timings = []
+        for _ in range(options['iterations']):
+            # Сигналы запроса закрывают/возвращают соединение так же, как в обработчике WSGI
+            request_started.send(sender=self.__class__)
+            started = time.perf_counter()
+            with transaction.atomic():
+                # Те же запросы, что выполняет courier_update_location; изменения откатываем
+                current = Order.objects.get(id=order.id, courier_id=order.courier_id, status='delivering')
+                current.courier_lat = current.courier_lat or 0
+                current.courier_lon = current.courier_lon or 0
+                current.courier_last_update = timezone.now()
+                current.save(update_fields=['courier_lat', 'courier_lon', 'courier_last_update'])
+                CourierLocation.objects.update_or_create(
+                    user_id=order.courier_id,
+                    defaults={'latitude': current.courier_lat, 'longitude': current.courier_lon}
+                )
+                transaction.set_rollback(True)
+            request_finished.send(sender=self.__class__)
+            timings.append(time.perf_counter() - started)
+
+        timings.sort()
+        total = sum(timings)
+        if mode == 'pool':
+            # В режиме пула connection_created срабатывает на каждую выдачу соединения,
+            # а реальные подключения к серверу считает сам пул
+            physical = connection.pool.get_stats().get('connections_num', 0)
+        else:
+            physical = len(new_connections)
+        self.stdout.write(
+            f"new server connections: {physical}, "
+            f"mean: {total / len(timings) * 1000:.2f} ms, "
+            f"p50: {percentile(timings, 50) * 1000:.2f} ms, "
+            f"p95: {percentile(timings, 95) * 1000:.2f} ms, "
+            f"p99: {percentile(timings, 99) * 1000:.2f} ms, "
+            f"throughput: {len(timings) / total:.0f} req/s"
+        )
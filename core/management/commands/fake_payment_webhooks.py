@@ -0,0 +1,73 @@
+import random
+import time
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import Payment
+from orders.webhooks import SIGNATURE_HEADER, WebhookError, build_event, receive_event, sign
+
+
+class Command(BaseCommand):
+    help = ('Local fake payment gateway: sends signed webhook events for payments in progress, '
+            'with duplicates, and reports receive throughput. Events go straight to the receiver '
+            'unless --url points at a running server.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100,
+                            help='Payments to send events for (default 100)')
+        parser.add_argument('--success-rate', type=float, default=0.85,
+                            help='Share of payment.succeeded events (default 0.85)')
+        parser.add_argument('--duplicate-rate', type=float, default=0.2,
+                            help='Share of events delivered twice (default 0.2)')
+        parser.add_argument('--status', action='append', default=[],
+                            help='Payment statuses to pick (default pending and processing)')
+        parser.add_argument('--url', help='Webhook URL of a running server, e.g. http://localhost:8000/orders/payments/webhook/')
+
+    def handle(self, *args, **options):
+        for name in ('success_rate', 'duplicate_rate'):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be between 0 and 1")
+
+        statuses = options['status'] or ['pending', 'processing']
+        payment_ids = list(
+            Payment.objects.filter(status__in=statuses).order_by('id').values_list('id', flat=True)[:options['count']]
+        )
+        if not payment_ids:
+            self.stdout.write('No payments to send events for.')
+            return
+
+        bodies = []
+        for payment_id in payment_ids:
+            succeeded = random.random() < options['success_rate']
+            body = build_event(
+                payment_id, succeeded,
+                reference=f'fake-{payment_id}' if succeeded else '',
+                error_message=None if succeeded else 'Недостаточно средств',
+            )
+            bodies.append(body)
+            if random.random() < options['duplicate_rate']:
+                bodies.append(body)
+
+        started = time.monotonic()
+        for body in bodies:
+            self._deliver(body, options['url'])
+        seconds = time.monotonic() - started
+        rate = len(bodies) / seconds if seconds else float(len(bodies))
+        self.stdout.write(self.style.SUCCESS(
+            f'Delivered {len(bodies)} event(s) for {len(payment_ids)} payment(s) '
+            f'in {seconds:.2f}s, {rate:.0f} events/s'
+        ))
+
+    def _deliver(self, body, url):
+        if not url:
+            try:
+                receive_event(body, sign(body))
+            except WebhookError as e:
+                raise CommandError(str(e))
+            return
+        request = urllib.request.Request(url, data=body, method='POST', headers={
+            'Content-Type': 'application/json', SIGNATURE_HEADER: sign(body),
+        })
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
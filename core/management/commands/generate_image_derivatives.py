@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from catalog.cache import bump_catalog_version, bump_bouquet_version
+from catalog.images import derivatives_ready
+from catalog.models import Bouquet, Flower, Ribbon, Wrapper
+
+PHOTO_MODELS = (Bouquet, Flower, Ribbon, Wrapper)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _generate(task):
+    # Функция уровня модуля, чтобы её можно было передать в Pool
+    name, force = task
+    from catalog.images import generate_derivatives
+    try:
+        return name, generate_derivatives(name, force=force), None
+    except Exception as e:
+        return name, 0, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Creates resized JPEG/WebP copies for existing bouquet, flower, ribbon and wrapper photos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate copies that already exist')
+
+    def handle(self, *args, **options):
+        names = set()
+        for model in PHOTO_MODELS:
+            names.update(
+                model.objects.exclude(photo__isnull=True).exclude(photo='')
+                .values_list('photo', flat=True)
+            )
+        if not options['force']:
+            names = {name for name in names if not derivatives_ready(name)}
+        if not names:
+            self.stdout.write('All photos already have derivatives.')
+            return
+
+        tasks = [(name, options['force']) for name in sorted(names)]
+        workers = max(1, min(options['workers'], len(tasks)))
+        self.stdout.write(f'Generating derivatives for {len(tasks)} photos with {workers} worker(s)...')
+
+        started = time.monotonic()
+        files = failed = 0
+        if workers > 1:
+            # Дочерние процессы не должны наследовать открытые соединения и пул
+            connections.close_all()
+            for connection in connections.all():
+                if hasattr(connection, 'close_pool'):
+                    connection.close_pool()
+            with multiprocessing.Pool(processes=workers, initializer=_init_worker) as pool:
+                results = list(pool.imap_unordered(_generate, tasks))
+        else:
+            results = [_generate(task) for task in tasks]
+
+        for name, written, error in results:
+            if error:
+                failed += 1
+                self.stderr.write(f'  {name}: {error}')
+            else:
+                files += written
+
+        # Карточки и страницы каталога были закэшированы без srcset
+        for bouquet_id in Bouquet.objects.filter(photo__in=names).values_list('id', flat=True):
+            bump_bouquet_version(bouquet_id)
+        bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done in {time.monotonic() - started:.1f}s: {files} files written, {failed} photo(s) failed.'
+        ))
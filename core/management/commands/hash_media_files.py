@@ -0,0 +1,52 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from catalog.models import Bouquet, Flower, Ribbon, Wrapper
+from core.storage import is_hashed_path
+
+PHOTO_MODELS = (Bouquet, Flower, Ribbon, Wrapper)
+
+
+class Command(BaseCommand):
+    help = ('Moves existing catalog photos to content-hashed names. The old file name is '
+            'kept in photo_original_name.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='Delete old files once no row refers to them')
+
+    def handle(self, *args, **options):
+        replaced = {}
+        for model in PHOTO_MODELS:
+            for obj in model.objects.exclude(photo__isnull=True).exclude(photo='').order_by('pk'):
+                old_name = obj.photo.name
+                if is_hashed_path(old_name):
+                    continue
+                if old_name not in replaced:
+                    if not default_storage.exists(old_name):
+                        self.stderr.write(f'  {model.__name__} #{obj.pk}: file {old_name} not found')
+                        continue
+                    with default_storage.open(old_name, 'rb') as source:
+                        # Каталог из upload_to сохраняется, одинаковые файлы получают одно имя
+                        replaced[old_name] = default_storage.save(old_name, source)
+
+                obj.photo.name = replaced[old_name]
+                obj.photo_original_name = obj.photo_original_name or os.path.basename(old_name)
+                # save() вызывает сигналы каталога: сброс кэша карточек и создание копий фото
+                obj.save(update_fields=['photo', 'photo_original_name'])
+                self.stdout.write(f'  {model.__name__} #{obj.pk}: {old_name} -> {replaced[old_name]}')
+
+        deleted = 0
+        if options['delete_originals']:
+            for old_name in replaced:
+                still_used = any(model.objects.filter(photo=old_name).exists() for model in PHOTO_MODELS)
+                if not still_used:
+                    default_storage.delete(old_name)
+                    deleted += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {len(replaced)} file(s) rehashed into {len(set(replaced.values()))} unique file(s), '
+            f'{deleted} original(s) deleted.'
+        ))
@@ -0,0 +1,308 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from http.cookiejar import CookieJar
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    # Редиректы не выполняем: каждый запрос должен измеряться отдельно
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class LoadTestStats:
+    """Thread-safe collector of per-endpoint latencies"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed):
+        result = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            result[endpoint] = {
+                'requests': len(values),
+                'errors': self.errors[endpoint],
+                'rps': round(len(values) / elapsed, 2),
+                'p50_ms': round(percentile(values, 50) * 1000, 1),
+                'p95_ms': round(percentile(values, 95) * 1000, 1),
+                'p99_ms': round(percentile(values, 99) * 1000, 1),
+            }
+        return result
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class VirtualUser:
+    """One HTTP session (cookies + CSRF token) that records timings into LoadTestStats"""
+
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    @property
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, endpoint, path, data=None):
+        """Performs one request, returns (status, location header, body)"""
+        body = None
+        headers = {}
+        if data is not None:
+            data = dict(data, csrfmiddlewaretoken=self.csrf_token)
+            body = urlencode(data).encode()
+            headers['X-CSRFToken'] = self.csrf_token
+            headers['Referer'] = self.base_url + path
+        req = Request(self.base_url + path, data=body, headers=headers)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                content = response.read().decode('utf-8', errors='replace')
+                status, location = response.status, response.headers.get('Location', '')
+        except HTTPError as e:
+            # 3xx без перехода приходят сюда же
+            content = e.read().decode('utf-8', errors='replace')
+            status, location = e.code, e.headers.get('Location', '')
+        except (URLError, OSError) as e:
+            self.stats.record(endpoint, time.perf_counter() - started, ok=False)
+            return 0, '', str(e)
+        self.stats.record(endpoint, time.perf_counter() - started, ok=status < 400)
+        return status, location, content
+
+    def login(self, email, password):
+        self.request('login_form', '/accounts/login/')
+        status, location, _ = self.request('login', '/accounts/login/', {'username': email, 'password': password})
+        return status == 302
+
+
+class Command(BaseCommand):
+    help = ('Runs a load test against a running server (seed it with seed_data --scale first): '
+            'client, florist and courier personas walk the critical paths and per-endpoint '
+            'p50/p95/p99 latency and RPS are reported.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--duration', type=int, default=60, help='Test duration in seconds.')
+        parser.add_argument('--clients', type=int, default=10, help='Concurrent client personas.')
+        parser.add_argument('--florists', type=int, default=2, help='Concurrent florist personas.')
+        parser.add_argument('--couriers', type=int, default=4, help='Concurrent courier personas.')
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help='Pause between steps of one persona, in seconds.')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--save-baseline', help='Write the results as a JSON baseline to this path.')
+        parser.add_argument('--baseline', help='Compare the results with a previously saved baseline.')
+        parser.add_argument('--max-regression', type=float, default=20.0,
+                            help='Allowed p95 growth against the baseline, in percent.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stats = LoadTestStats()
+        self.deadline = time.monotonic() + options['duration']
+
+        personas = (
+            [(self.client_scenario, i) for i in range(1, options['clients'] + 1)]
+            + [(self.florist_scenario, i) for i in range(1, options['florists'] + 1)]
+            + [(self.courier_scenario, i) for i in range(1, options['couriers'] + 1)]
+        )
+        if not personas:
+            raise CommandError("Nothing to run: all persona counts are zero.")
+
+        self.stdout.write(f"Running {len(personas)} personas against {options['base_url']} "
+                          f"for {options['duration']}s...")
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=self.run_persona, args=(scenario, number), daemon=True)
+            for scenario, number in personas
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        summary = self.stats.summary(elapsed)
+        if not summary:
+            raise CommandError("No requests were made. Is the server running?")
+        self.print_summary(summary, elapsed)
+
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(
+                json.dumps({'created_at': timezone.now().isoformat(), 'options': {
+                    key: options[key] for key in ('duration', 'clients', 'florists', 'couriers', 'think_time')
+                }, 'endpoints': summary}, ensure_ascii=False, indent=2),
+                encoding='utf-8'
+            )
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['save_baseline']}"))
+
+        if options['baseline']:
+            regressions = self.compare_with_baseline(summary, options['baseline'])
+            if regressions:
+                raise CommandError(f"p95 regressions detected: {', '.join(regressions)}")
+
+    def run_persona(self, scenario, number):
+        rng = random.Random(f"{self.options['seed']}:{scenario.__name__}:{number}")
+        user = VirtualUser(self.options['base_url'], self.stats, self.options['timeout'])
+        try:
+            scenario(user, number, rng)
+        except Exception as e:
+            self.stderr.write(f"{scenario.__name__} #{number} stopped: {e}")
+
+    def running(self):
+        return time.monotonic() < self.deadline
+
+    def pause(self):
+        if self.options['think_time']:
+            time.sleep(self.options['think_time'])
+
+    # --- Сценарии персон ---
+
+    def client_scenario(self, user, number, rng):
+        """browse -> detail -> add_to_cart -> order_create -> order_pay"""
+        if not user.login(f"load_client_{number}@example.com", 'clientpass'):
+            raise CommandError(f"cannot log in as load_client_{number}")
+        sorts = ['', 'price_asc', 'price_desc']
+        while self.running():
+            params = {'sort': rng.choice(sorts), 'page': rng.randint(1, 2)}
+            status, _, body = user.request('bouquet_list', '/catalog/?' + urlencode(params))
+            bouquet_ids = re.findall(r'/cart/add/(\d+)/', body)
+            if not bouquet_ids:
+                self.pause()
+                continue
+            bouquet_id = rng.choice(bouquet_ids)
+            user.request('bouquet_detail', f'/catalog/{bouquet_id}/')
+            self.pause()
+            user.request('add_to_cart', f'/cart/add/{bouquet_id}/', {'quantity': rng.randint(1, 2)})
+            user.request('cart_detail', '/cart/')
+            self.pause()
+
+            user.request('order_form', '/orders/create/')
+            delivery = timezone.localtime() + timedelta(hours=rng.randint(2, 24))
+            status, location, _ = user.request('order_create', '/orders/create/', {
+                'recipient_name': 'Load Test',
+                'recipient_phone': '+996700000000',
+                'delivery_address_name': 'ул. Тестовая, 1',
+                'delivery_lat': settings.SHOP_LAT + rng.uniform(-0.05, 0.05),
+                'delivery_lon': settings.SHOP_LON + rng.uniform(-0.08, 0.08),
+                'delivery_distance': rng.randint(500, 15000),
+                'delivery_datetime': delivery.strftime('%Y-%m-%dT%H:%M'),
+            })
+            match = re.search(r'/orders/(\d+)/pay/', location)
+            if status != 302 or not match:
+                continue
+            self.pause()
+            user.request('order_pay', match.group(0), {
+                'card_number': '4111 1111 1111 1111',
+                'expiry_date': '12/30',
+                'cvv': '123',
+            })
+            user.request('order_tracking', f'/orders/{match.group(1)}/tracking/')
+            user.request('delivery_quote', '/orders/delivery-quote/?' + urlencode({
+                'lat': settings.SHOP_LAT + rng.uniform(-0.05, 0.05),
+                'lon': settings.SHOP_LON + rng.uniform(-0.08, 0.08),
+            }))
+            user.request('order_list', '/orders/my/')
+            self.pause()
+
+    def florist_scenario(self, user, number, rng):
+        """dashboard -> florist_task_complete"""
+        if not user.login(f"load_florist_{number}@example.com", 'floristpass'):
+            raise CommandError(f"cannot log in as load_florist_{number}")
+        while self.running():
+            _, _, body = user.request('florist_dashboard', '/orders/florist/dashboard/?status=paid')
+            order_ids = re.findall(r'/orders/florist/task/(\d+)/complete/', body)
+            if order_ids:
+                user.request('florist_task_complete', f'/orders/florist/task/{rng.choice(order_ids)}/complete/', {})
+            self.pause()
+
+    def courier_scenario(self, user, number, rng):
+        """dashboard -> start delivery -> GPS pings -> deliver"""
+        if not user.login(f"load_courier_{number}@example.com", 'courierpass'):
+            raise CommandError(f"cannot log in as load_courier_{number}")
+        while self.running():
+            _, _, body = user.request('courier_dashboard', '/orders/courier/dashboard/?status=delivering')
+            to_complete = re.findall(r'/orders/courier/task/(\d+)/complete/', body)
+            if not to_complete:
+                _, _, body = user.request('courier_dashboard', '/orders/courier/dashboard/?status=ready')
+                to_start = re.findall(r'/orders/courier/task/(\d+)/start/', body)
+                if not to_start:
+                    self.pause()
+                    continue
+                user.request('courier_start_delivery', f'/orders/courier/task/{to_start[0]}/start/', {})
+                to_complete = to_start
+            order_id = to_complete[0]
+            lat, lon = settings.SHOP_LAT, settings.SHOP_LON
+            for _ in range(rng.randint(5, 15)):
+                if not self.running():
+                    return
+                lat += rng.uniform(-0.001, 0.001)
+                lon += rng.uniform(-0.001, 0.001)
+                user.request('courier_update_location', f'/orders/courier/task/{order_id}/update-location/',
+                             {'lat': f"{lat:.6f}", 'lon': f"{lon:.6f}"})
+                self.pause()
+            user.request('courier_task_complete', f'/orders/courier/task/{order_id}/complete/', {})
+
+    # --- Отчёт ---
+
+    def print_summary(self, summary, elapsed):
+        total = sum(row['requests'] for row in summary.values())
+        self.stdout.write(f"\n{'endpoint':<28}{'reqs':>8}{'errs':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for endpoint, row in summary.items():
+            self.stdout.write(
+                f"{endpoint:<28}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9}"
+                f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+            )
+        self.stdout.write(f"\nTotal: {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} rps)")
+
+    def compare_with_baseline(self, summary, baseline_path):
+        try:
+            baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))['endpoints']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Cannot read baseline {baseline_path}: {e}")
+
+        regressions = []
+        self.stdout.write(f"\nComparison with baseline {baseline_path} (p95):")
+        for endpoint, row in summary.items():
+            old = baseline.get(endpoint)
+            if not old or not old['p95_ms']:
+                continue
+            change = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+            line = f"  {endpoint:<28}{old['p95_ms']:>10} -> {row['p95_ms']:<10}({change:+.1f}%)"
+            if change > self.options['max_regression']:
+                regressions.append(endpoint)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return regressions
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.payments import process_pending_payments
+
+
+class Command(BaseCommand):
+    help = ('Processes queued payments through the configured payment gateway '
+            'and settles payments stuck in processing with the gateway.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the queue instead of exiting after one pass')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds between queue polls with --loop (default 2)')
+        parser.add_argument('--limit', type=int,
+                            help='Maximum payments per pass')
+
+    def handle(self, *args, **options):
+        if options['interval'] <= 0:
+            raise CommandError('--interval must be positive')
+
+        while True:
+            outcomes = process_pending_payments(options['limit'])
+            if outcomes:
+                summary = ', '.join(f'{status}: {count}' for status, count in sorted(outcomes.items()))
+                self.stdout.write(f'Processed {sum(outcomes.values())} payment(s) ({summary})')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
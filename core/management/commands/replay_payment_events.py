@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from orders.models import PaymentEvent
+from orders.webhooks import replay_events
+
+
+class Command(BaseCommand):
+    help = ('Re-applies stored payment gateway events. Transitions that already happened '
+            'are not repeated, so replaying is safe.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event-id', action='append', default=[],
+                            help='Gateway event id to replay (repeatable)')
+        parser.add_argument('--payment', type=int, help='Replay all events of this payment id')
+        parser.add_argument('--since', help='Replay events received at or after this ISO datetime')
+        parser.add_argument('--all', action='store_true', help='Replay every stored event')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the selected events')
+
+    def handle(self, *args, **options):
+        events = PaymentEvent.objects.all()
+        if options['event_id']:
+            events = events.filter(event_id__in=options['event_id'])
+        if options['payment'] is not None:
+            events = events.filter(payment_id=options['payment'])
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Not a datetime: {options['since']}")
+            events = events.filter(received_at__gte=since)
+        if not (options['event_id'] or options['payment'] is not None or options['since'] or options['all']):
+            raise CommandError('Select events with --event-id, --payment, --since or --all')
+
+        if options['dry_run']:
+            self.stdout.write(f'{events.count()} event(s) would be replayed.')
+            return
+
+        reset, stats = replay_events(events)
+        self.stdout.write(self.style.SUCCESS(f'Replayed {reset} event(s). {stats}'))
@@ -0,0 +1,56 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import Bouquet
+from catalog.pricing import ROUNDING_MODES, RepricingRule, apply_repricing, preview_repricing
+
+
+def _decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise CommandError(f'Not a number: {value}')
+
+
+class Command(BaseCommand):
+    help = ('Recalculates bouquet prices from component cost with a margin and rounding rule. '
+            'Shows a preview unless --apply is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--margin', type=_decimal, required=True,
+                            help='Margin over component cost, percent (e.g. 60)')
+        parser.add_argument('--step', type=_decimal, default=Decimal('10'),
+                            help='Round prices to a multiple of this amount (default 10)')
+        parser.add_argument('--rounding', choices=sorted(ROUNDING_MODES), default='up',
+                            help='Rounding direction (default up)')
+        parser.add_argument('--include-inactive', action='store_true',
+                            help='Reprice inactive bouquets too')
+        parser.add_argument('--apply', action='store_true',
+                            help='Write new prices; without it only the preview is shown')
+
+    def handle(self, *args, **options):
+        try:
+            rule = RepricingRule(options['margin'], options['step'], options['rounding'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        bouquets = Bouquet.objects.all() if options['include_inactive'] else Bouquet.objects.filter(is_active=True)
+        changes = preview_repricing(rule, bouquets)
+        if not changes:
+            self.stdout.write('All prices already match the rule.')
+            return
+
+        for change in changes:
+            self.stdout.write(
+                f"  #{change['id']} {change['name']}: cost {change['cost']:.2f}, "
+                f"{change['old_price']} -> {change['new_price']}"
+            )
+        if not options['apply']:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {len(changes)} price(s) would change. Re-run with --apply to save them.'
+            ))
+            return
+
+        updated = apply_repricing(changes)
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} bouquet price(s).'))
@@ -1,21 +1,36 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 import time
 import logging
-from core.tasks import assign_florist_task, assign_courier_task
+from core.tasks import (
+    apply_payment_events_task, assign_florist_task, assign_courier_task, process_payments_task, sweep_expired_task,
+)
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
-    help = 'Запускает фоновый планировщик задач (назначение флористов и курьеров)'
+    help = 'Запускает фоновый планировщик задач (назначение флористов и курьеров, очередь оплат и вебхуков шлюза, ночная очистка)'
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Фоновый планировщик запущен...'))
+        # Дата последней ночной очистки: запускаем её раз в сутки в час SWEEP_HOUR
+        last_sweep_date = None
         try:
             while True:
                 logger.info("🟢 Цикл планировщика начат")
 
                 assign_florist_task()
                 assign_courier_task()
+                # Оплаты, оставшиеся в очереди или зависшие в processing
+                self.run_safely(process_payments_task)
+                # События вебхуков, которые не успел применить фоновый поток
+                self.run_safely(apply_payment_events_task)
+
+                now = timezone.localtime()
+                if now.hour == settings.SWEEP_HOUR and last_sweep_date != now.date():
+                    last_sweep_date = now.date()
+                    self.run_safely(sweep_expired_task)
 
                 logger.info("⏳ Пауза перед следующим циклом...")
                 time.sleep(60)  # Повторять каждые 60 секунд (можно настроить)
@@ -23,3 +38,10 @@ class Command(BaseCommand):
         except KeyboardInterrupt:
             logger.warning("⛔ Планировщик остановлен вручную")
             self.stdout.write(self.style.WARNING('Фоновый планировщик остановлен'))
+
+    def run_safely(self, task):
+        # Сбой обслуживающей задачи не должен останавливать назначение заказов
+        try:
+            task()
+        except Exception:
+            logger.exception(f"Ошибка задачи {task.__name__}")
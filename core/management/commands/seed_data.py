@@ -1,20 +1,24 @@
 import random
 import json
 import os
+import time
+import multiprocessing
 from decimal import Decimal
 from datetime import timedelta
 from pathlib import Path
 
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.utils import timezone
-from django.db import transaction
+from django.db import transaction, connections
+from django.conf import settings
 
 from orders.models import Order, OrderItem, Payment, CourierLocation, UserStatus, WorkRecord, Cart, CartItem
 from catalog.models import (
     Bouquet, Flower, Ribbon, Wrapper,
     StockFlower, StockRibbon, StockWrapper,
-    BouquetFlower, BouquetRibbon, BouquetWrapper
+    BouquetFlower, BouquetRibbon, BouquetWrapper, Tag
 )
 
 User = get_user_model()
@@ -57,8 +61,43 @@ class Command(BaseCommand):
     def COURIERS_DATA(self):
         return self.seed_data['couriers']
 
-    @transaction.atomic
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=int, default=0,
+            help='Generate this many synthetic orders (with items, payments, stock lots, '
+                 'users and courier locations) on top of the base data for load testing.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows per bulk_create batch in --scale mode.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of worker processes generating orders in --scale mode.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Random seed, so that generated data is reproducible between runs.'
+        )
+
     def handle(self, *args, **options):
+        # Фиксируем seed, чтобы базовые данные тоже были воспроизводимыми
+        random.seed(options['seed'])
+
+        # Базовые данные коммитим до генерации объёмов: воркеры работают
+        # в отдельных процессах и должны видеть созданные пользователей и букеты
+        with transaction.atomic():
+            self.seed_base_data()
+
+        if options['scale'] > 0:
+            self.seed_scaled_data(
+                orders_count=options['scale'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                seed=options['seed'],
+            )
+
+    def seed_base_data(self):
         self.stdout.write("Deleting old data...")
         OrderItem.objects.all().delete()
         Payment.objects.all().delete()
@@ -112,11 +151,146 @@ class Command(BaseCommand):
                     num_items_in_cart = random.randint(1, min(2, len(created_bouquets)))
                     bouquets_for_cart = random.sample(created_bouquets, num_items_in_cart)
                     for bouquet_to_add in bouquets_for_cart:
-                        CartItem.objects.get_or_create(cart=cart, bouquet=bouquet_to_add, defaults={'quantity': random.randint(1, 2)})
+                        CartItem.objects.get_or_create(cart=cart, bouquet=bouquet_to_add, defaults={'quantity': random.randint(1, 2), 'price': bouquet_to_add.price})
 
             self.stdout.write("Carts created.")
         self.stdout.write(self.style.SUCCESS("Database seeding complete."))
 
+    def seed_scaled_data(self, orders_count, batch_size, workers, seed):
+        """Generate large volumes of data for load testing using bulk_create"""
+        rng = random.Random(seed)
+        started = time.monotonic()
+        self.stdout.write(f"Scale mode: generating {orders_count} orders (batch size {batch_size}, workers {workers})...")
+
+        # Объёмы вспомогательных данных растут вместе с количеством заказов
+        clients = self.bulk_create_users('client', max(10, orders_count // 20), batch_size)
+        florists = self.bulk_create_users('florist', max(5, orders_count // 2000), batch_size)
+        couriers = self.bulk_create_users('courier', max(5, orders_count // 1000), batch_size)
+        self.bulk_create_courier_locations(couriers, rng, batch_size)
+        self.bulk_create_stock(max(10, orders_count // 100), rng, batch_size)
+
+        context = {
+            'client_ids': clients,
+            'florist_ids': florists,
+            'courier_ids': couriers,
+            'bouquets': [
+                (bouquet_id, str(price))
+                for bouquet_id, price in Bouquet.objects.filter(is_active=True).values_list('id', 'price')
+            ],
+            'compositions': dict(Bouquet.objects.filter(is_active=True).values_list('id', 'composition')),
+            'base_time': timezone.now().replace(minute=0, second=0, microsecond=0),
+            'seed': seed,
+        }
+        if not context['bouquets']:
+            self.stdout.write(self.style.WARNING("No active bouquets, skipping orders."))
+            return
+
+        # Каждый чанк получает собственный seed, поэтому результат
+        # не зависит от количества воркеров и порядка их выполнения
+        chunks = [
+            (index, start, min(batch_size, orders_count - start), context)
+            for index, start in enumerate(range(0, orders_count, batch_size))
+        ]
+        totals = {'orders': 0, 'items': 0, 'payments': 0}
+        if workers > 1:
+            # Дочерние процессы не должны наследовать открытые соединения и пул
+            connections.close_all()
+            for connection in connections.all():
+                if hasattr(connection, 'close_pool'):
+                    connection.close_pool()
+            with multiprocessing.Pool(processes=workers, initializer=_init_scale_worker) as pool:
+                results = pool.imap_unordered(_generate_orders_chunk, chunks)
+                for result in results:
+                    self._report_chunk(result, totals, orders_count)
+        else:
+            for chunk in chunks:
+                self._report_chunk(_generate_orders_chunk(chunk), totals, orders_count)
+
+        elapsed = time.monotonic() - started
+        total_rows = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Scale seeding complete: {totals['orders']} orders, {totals['items']} items, "
+            f"{totals['payments']} payments in {elapsed:.1f}s ({total_rows / max(elapsed, 0.001):.0f} rows/s)."
+        ))
+
+    def _report_chunk(self, result, totals, orders_count):
+        for key in totals:
+            totals[key] += result[key]
+        self.stdout.write(f"  orders: {totals['orders']}/{orders_count}")
+
+    def bulk_create_users(self, role, count, batch_size):
+        """Create synthetic users of the given role, returns list of their ids"""
+        self.stdout.write(f"Creating {count} synthetic {role}s...")
+        # Хешируем пароль один раз: хеширование на каждого пользователя заняло бы минуты
+        password = make_password(f"{role}pass")
+        users = [
+            User(
+                username=f"load_{role}_{i}",
+                email=f"load_{role}_{i}@example.com",
+                password=password,
+                first_name=role.capitalize(),
+                last_name=str(i),
+                role=role,
+                phone=f"+996 555 {i:06d}",
+            )
+            for i in range(1, count + 1)
+        ]
+        created = User.objects.bulk_create(users, batch_size=batch_size)
+        user_ids = [user.id for user in created]
+        if role in ('florist', 'courier'):
+            UserStatus.objects.bulk_create(
+                [UserStatus(user_id=user_id, status='available') for user_id in user_ids],
+                batch_size=batch_size
+            )
+        return user_ids
+
+    def bulk_create_courier_locations(self, courier_ids, rng, batch_size):
+        self.stdout.write(f"Creating {len(courier_ids)} courier locations...")
+        CourierLocation.objects.bulk_create([
+            CourierLocation(
+                user_id=courier_id,
+                latitude=round(settings.SHOP_LAT + rng.uniform(-0.05, 0.05), 6),
+                longitude=round(settings.SHOP_LON + rng.uniform(-0.08, 0.08), 6),
+            )
+            for courier_id in courier_ids
+        ], batch_size=batch_size)
+
+    def bulk_create_stock(self, lots_per_component, rng, batch_size):
+        """Create many stock lots for every flower, ribbon and wrapper"""
+        self.stdout.write(f"Creating {lots_per_component} stock lots per component...")
+        today = timezone.now().date()
+        StockFlower.objects.bulk_create([
+            StockFlower(
+                flower_id=flower_id,
+                delivery_date=today - timedelta(days=rng.randint(0, 30)),
+                quantity=rng.randint(50, 500),
+                number=f"LOAD-F{flower_id}-{lot}",
+                status='available',
+            )
+            for flower_id in Flower.objects.values_list('id', flat=True)
+            for lot in range(lots_per_component)
+        ], batch_size=batch_size)
+        StockRibbon.objects.bulk_create([
+            StockRibbon(
+                ribbon_id=ribbon_id,
+                delivery_date=today - timedelta(days=rng.randint(0, 30)),
+                length=rng.randint(50, 200),
+                status='available',
+            )
+            for ribbon_id in Ribbon.objects.values_list('id', flat=True)
+            for lot in range(lots_per_component)
+        ], batch_size=batch_size)
+        StockWrapper.objects.bulk_create([
+            StockWrapper(
+                wrapper_id=wrapper_id,
+                delivery_date=today - timedelta(days=rng.randint(0, 30)),
+                length=rng.randint(30, 150),
+                status='available',
+            )
+            for wrapper_id in Wrapper.objects.values_list('id', flat=True)
+            for lot in range(lots_per_component)
+        ], batch_size=batch_size)
+
     def create_flowers(self):
         """Create flowers from predefined data"""
         created_flowers = []
@@ -198,11 +372,14 @@ class Command(BaseCommand):
                     'price': Decimal(bouquet_data['price']),
                     'description': bouquet_data['description'],
                     'photo': bouquet_data['photo'],
-                    'tag': bouquet_data['tag'],
                     'is_active': bouquet_data['is_active'],
                 }
             )
             created_bouquets.append(bouquet)
+            if created:
+                bouquet.tags.set([
+                    Tag.objects.get_or_create(name=name)[0] for name in bouquet_data['tags']
+                ])
 
             # Добавляем компоненты букета
             for flower_item in bouquet_data['composition']['flowers']:
@@ -335,4 +512,105 @@ class Command(BaseCommand):
                 )
             
             created_couriers.append(user)
-        return created_couriers
\ No newline at end of file
+        return created_couriers
+
+
+# --- Генерация заказов для --scale (функции уровня модуля, чтобы их можно было передать в Pool) ---
+
+# Распределение статусов примерно как у магазина с многолетней историей
+SCALE_ORDER_STATUSES = ['new', 'paid', 'ready', 'delivering', 'delivered', 'completed', 'canceled']
+SCALE_ORDER_WEIGHTS = [5, 5, 3, 2, 5, 75, 5]
+SCALE_RECIPIENT_NAMES = ['Айгуль', 'Бакыт', 'Елена', 'Нурлан', 'Ольга', 'Тимур', 'Асель', 'Данияр']
+
+
+def _init_scale_worker():
+    import django
+    django.setup()
+
+
+def _generate_orders_chunk(chunk):
+    """Create one batch of orders with their items and payments, returns row counts"""
+    index, start, count, context = chunk
+    rng = random.Random(f"{context['seed']}:{index}")
+    base_time = context['base_time']
+    price_per_meter = Decimal(str(settings.BASE_DELIVERY_PRICE_PER_METER))
+
+    orders = []
+    created_at_values = []
+    order_lines = []
+    for _ in range(count):
+        status = rng.choices(SCALE_ORDER_STATUSES, weights=SCALE_ORDER_WEIGHTS, k=1)[0]
+        if status in ('new', 'paid', 'ready', 'delivering'):
+            # Активные заказы — свежие, доставка в ближайшие часы
+            created_at = base_time - timedelta(minutes=rng.randint(5, 24 * 60))
+            delivery_datetime = base_time + timedelta(minutes=rng.randint(30, 48 * 60))
+        else:
+            # Завершённые заказы распределены по последним трём годам
+            created_at = base_time - timedelta(minutes=rng.randint(24 * 60, 3 * 365 * 24 * 60))
+            delivery_datetime = created_at + timedelta(hours=rng.randint(2, 48))
+
+        lines = rng.sample(context['bouquets'], rng.randint(1, min(3, len(context['bouquets']))))
+        lines = [(bouquet_id, Decimal(price), rng.randint(1, 3)) for bouquet_id, price in lines]
+        distance = rng.randint(500, 15000)
+        delivery_cost = (distance * price_per_meter).quantize(Decimal('0.01'))
+        bouquets_cost = sum(price * quantity for _, price, quantity in lines)
+
+        order = Order(
+            customer_id=rng.choice(context['client_ids']),
+            status=status,
+            delivery_datetime=delivery_datetime,
+            total_cost=bouquets_cost + delivery_cost,
+            delivery_cost=delivery_cost,
+            delivery_distance=distance,
+            delivery_address_name=f"ул. Тестовая, {rng.randint(1, 300)}",
+            delivery_lat=round(settings.SHOP_LAT + rng.uniform(-0.05, 0.05), 6),
+            delivery_lon=round(settings.SHOP_LON + rng.uniform(-0.08, 0.08), 6),
+            recipient_name=rng.choice(SCALE_RECIPIENT_NAMES),
+            recipient_phone=f"+996 700 {rng.randint(0, 999999):06d}",
+        )
+        if status not in ('new', 'canceled'):
+            order.florist_id = rng.choice(context['florist_ids'])
+        if status in ('ready', 'delivering', 'delivered', 'completed'):
+            order.courier_id = rng.choice(context['courier_ids'])
+        if status == 'delivering':
+            order.courier_lat = round(settings.SHOP_LAT + rng.uniform(-0.05, 0.05), 6)
+            order.courier_lon = round(settings.SHOP_LON + rng.uniform(-0.08, 0.08), 6)
+            order.courier_last_update = base_time
+        orders.append(order)
+        created_at_values.append(created_at)
+        order_lines.append(lines)
+
+    with transaction.atomic():
+        Order.objects.bulk_create(orders)
+        # auto_now_add/auto_now перезаписывают даты при вставке,
+        # поэтому историю проставляем отдельным bulk_update
+        for order, created_at in zip(orders, created_at_values):
+            order.created_at = created_at
+            order.updated_at = created_at
+        Order.objects.bulk_update(orders, ['created_at', 'updated_at'], batch_size=1000)
+
+        items = []
+        payments = []
+        for order, lines, created_at in zip(orders, order_lines, created_at_values):
+            for bouquet_id, price, quantity in lines:
+                items.append(OrderItem(
+                    order=order, bouquet_id=bouquet_id, quantity=quantity, price_per_item=price,
+                    composition=context['compositions'][bouquet_id],
+                ))
+            if order.status == 'new':
+                payment_status, paid_at = rng.choice([('new', None), ('failed', None)])
+            elif order.status == 'canceled':
+                payment_status, paid_at = 'refunded', created_at + timedelta(minutes=5)
+            else:
+                payment_status, paid_at = 'success', created_at + timedelta(minutes=5)
+            payments.append(Payment(
+                order=order,
+                amount=order.total_cost,
+                status=payment_status,
+                payment_method='card',
+                paid_at=paid_at,
+            ))
+        OrderItem.objects.bulk_create(items)
+        Payment.objects.bulk_create(payments)
+
+    return {'orders': len(orders), 'items': len(items), 'payments': len(payments)}
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sweeper import abandoned_carts, expired_sessions, stale_carts, sweep_expired
+
+
+class Command(BaseCommand):
+    help = ('Deletes expired sessions, cancels abandoned carts and deletes old canceled carts '
+            'in small primary-key batches with a pause between them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            help='Rows per batch (default SWEEP_BATCH_SIZE)')
+        parser.add_argument('--pause', type=float,
+                            help='Seconds to sleep between batches (default SWEEP_BATCH_PAUSE)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the rows that would be swept')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        if options['pause'] is not None and options['pause'] < 0:
+            raise CommandError('--pause must not be negative')
+
+        if options['dry_run']:
+            for name, queryset in (('sessions', expired_sessions()),
+                                   ('abandoned carts', abandoned_carts()),
+                                   ('stale carts', stale_carts())):
+                self.stdout.write(f'{name}: {queryset.count()} row(s) to sweep')
+            return
+
+        for stats in sweep_expired(options['batch_size'], options['pause']):
+            self.stdout.write(self.style.SUCCESS(str(stats)))
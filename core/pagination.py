@@ -0,0 +1,125 @@
+# core/pagination.py
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    Страница keyset-пагинации. Совместима с шаблоном _pagination.html:
+    вместо номеров страниц отдаёт курсоры next_cursor / previous_cursor.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page and bool(self.object_list)
+
+    def has_previous(self):
+        return self.has_previous_page and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        return self.paginator.encode_cursor(self.object_list[-1]) if self.has_next() else None
+
+    @property
+    def previous_cursor(self):
+        return self.paginator.encode_cursor(self.object_list[0]) if self.has_previous() else None
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу (курсору) вместо OFFSET: без COUNT(*) и с одинаковой
+    стоимостью любой страницы. ordering должен однозначно упорядочивать строки,
+    поэтому последним полем всегда идёт уникальное поле, например ('-created_at', '-id').
+    Для скорости нужен составной индекс по полям фильтра и ordering.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+        model_meta = queryset.model._meta
+        self.model_fields = [model_meta.get_field(name) for name in self.fields]
+
+    def encode_cursor(self, obj):
+        # obj — экземпляр модели или словарь из .values()
+        if isinstance(obj, dict):
+            values = [obj[field.attname] for field in self.model_fields]
+        else:
+            values = [getattr(obj, field.attname) for field in self.model_fields]
+        raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения ключа или None, если курсор повреждён."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if len(values) != len(self.model_fields):
+                return None
+            return [field.to_python(value) for field, value in zip(self.model_fields, values)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _seek_filter(self, values, reverse):
+        # Строим (f1 <= v1) AND ((f1 < v1) OR (f2 < v2 ...)) — ведущее условие
+        # по первому полю позволяет использовать составной индекс диапазоном
+        condition = None
+        for field, descending, value in reversed(list(zip(self.fields, self.descending, values))):
+            use_lt = descending != reverse
+            strict = Q(**{f"{field}__{'lt' if use_lt else 'gt'}": value})
+            if condition is None:
+                condition = strict
+            else:
+                inclusive = Q(**{f"{field}__{'lte' if use_lt else 'gte'}": value})
+                condition = inclusive & (strict | condition)
+        return condition
+
+    def get_page(self, after=None, before=None):
+        after_values = self.decode_cursor(after) if after else None
+        before_values = self.decode_cursor(before) if before and not after_values else None
+
+        if before_values is not None:
+            # Идём назад: обратная сортировка, затем разворачиваем результат
+            reverse_ordering = [name[1:] if name.startswith('-') else f"-{name}" for name in self.ordering]
+            rows = list(
+                self.queryset.filter(self._seek_filter(before_values, reverse=True))
+                .order_by(*reverse_ordering)[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_previous)
+
+        queryset = self.queryset.order_by(*self.ordering)
+        if after_values is not None:
+            queryset = queryset.filter(self._seek_filter(after_values, reverse=False))
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(rows[:self.per_page], self, has_next=has_next, has_previous=after_values is not None)
+
+    def get_page_from_request(self, request):
+        return self.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
@@ -0,0 +1,84 @@
+# core/session_backend.py
+# Сессии с чтением из кэша и отложенной записью в базу (write-behind).
+# Как и cached_db, сессия читается из кэша, а при промахе — из django_session.
+# Изменения существующей сессии сразу попадают в кэш, а строка в базе обновляется
+# фоновым потоком после ответа. Несколько изменений одной сессии, ожидающих записи,
+# сливаются в одну: в базу уходит только последнее состояние.
+# Новая сессия создаётся в базе сразу — так проверяется уникальность ключа.
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# session_key -> (модель, закодированные данные, срок действия), ещё не записанные в базу
+_pending = {}
+_pending_lock = threading.Lock()
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.SESSION_DB_WRITE_WORKERS, thread_name_prefix='session-write-behind'
+        )
+    return _executor
+
+
+def _write_pending(session_key):
+    with _pending_lock:
+        pending = _pending.pop(session_key, None)
+    if pending is None:
+        return
+    model, session_data, expire_date = pending
+    try:
+        # update(), а не save(): сессию, удалённую за это время (выход, flush), не воскрешаем
+        model.objects.filter(session_key=session_key).update(
+            session_data=session_data, expire_date=expire_date
+        )
+    except Exception:
+        logger.exception("Не удалось записать сессию %s в базу", session_key[:8])
+    finally:
+        close_old_connections()
+
+
+def schedule_write(model, session_key, session_data, expire_date):
+    with _pending_lock:
+        queued = session_key in _pending
+        _pending[session_key] = (model, session_data, expire_date)
+    if not queued:
+        get_executor().submit(_write_pending, session_key)
+
+
+def discard_pending(session_key):
+    with _pending_lock:
+        _pending.pop(session_key, None)
+
+
+class SessionStore(CachedDBStore):
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or not settings.SESSION_DB_WRITE_BEHIND:
+            return super().save(must_create)
+        try:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+            # Без кэша отложенная запись потеряла бы изменения — пишем сразу
+            return super().save(must_create)
+        # Данные кодируются сейчас: словарь сессии может измениться после ответа
+        schedule_write(
+            self.model, self.session_key,
+            self.encode(self._get_session(no_load=must_create)), self.get_expiry_date(),
+        )
+
+    def delete(self, session_key=None):
+        key = session_key or self.session_key
+        if key is not None:
+            discard_pending(key)
+        super().delete(session_key)
@@ -0,0 +1,137 @@
+# core/storage.py
+# Хранилище медиа с адресацией по содержимому: файл сохраняется под SHA-256
+# своего содержимого (bouquets/3f/3fa9….jpg), одинаковые загрузки дают один файл,
+# а повторная загрузка никогда не перезаписывает уже выданный адрес. Поэтому такие
+# файлы можно отдавать с Cache-Control: immutable (см. core/views.serve_media).
+# Здесь же хранилище статики с хэшированными именами и заранее сжатыми копиями.
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:  # без пакета brotli создаются только .gz
+    brotli = None
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Путь, содержащий хэш содержимого: <каталог>/<2 символа>/<64 символа>[.ext]
+HASHED_PATH_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?(/|$)')
+
+
+def content_hash(content):
+    hasher = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return hasher.hexdigest()
+
+
+def guess_image_type(content):
+    """MIME-тип изображения по содержимому — для старых файлов без расширения."""
+    try:
+        content.seek(0)
+        with Image.open(content) as image:
+            return Image.MIME.get(image.format)
+    except (OSError, AttributeError, ValueError):
+        return None
+    finally:
+        content.seek(0)
+
+
+def is_hashed_path(name):
+    return bool(HASHED_PATH_RE.search(name))
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    FileSystemStorage, сохраняющий файлы под хэшем содержимого в каталоге из upload_to.
+    Исходное имя файла в путь не попадает; модели хранят его отдельным полем.
+    """
+    # Каталоги, имена в которых уже однозначно определяются содержимым (копии фото
+    # строятся от хэшированного оригинала) — их сохраняем как есть
+    passthrough_dirs = ('derivatives/',)
+
+    def hashed_name(self, name, content):
+        directory, filename = posixpath.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        if not ext:
+            content_type = getattr(content, 'content_type', None) or guess_image_type(content)
+            ext = (content_type and mimetypes.guess_extension(content_type)) or ''
+        digest = content_hash(content)
+        return posixpath.join(directory, digest[:2], f'{digest}{ext}')
+
+    def _save(self, name, content):
+        if name.startswith(self.passthrough_dirs):
+            return super()._save(name, content)
+
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Такой файл уже загружали — используем его
+            return name
+        return super()._save(name, content)
+
+
+# Сжимаем только текстовые форматы: картинки и шрифты woff/woff2 уже сжаты
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml',
+                           '.ico', '.ttf', '.otf', '.eot')
+MIN_COMPRESS_SIZE = 256
+# Сжатая копия сохраняется, только если она заметно меньше оригинала
+MAX_COMPRESSED_RATIO = 0.95
+
+
+def compress_file(path):
+    """Пишет рядом с файлом path.gz и path.br. Возвращает список созданных суффиксов."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = [('.gz', lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda: brotli.compress(data, quality=11)))
+
+    created = []
+    for suffix, compress in variants:
+        compressed = compress()
+        if len(compressed) <= len(data) * MAX_COMPRESSED_RATIO:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            created.append(suffix)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return created
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage, который после хэширования имён создаёт gzip- и
+    brotli-копии файлов. Сжатие выполняется при collectstatic в пуле потоков
+    (zlib и brotli отпускают GIL), при запросе core.views.serve_static только
+    выбирает подходящую копию.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        names = sorted({
+            name for name in [*paths, *self.hashed_files.values()]
+            if name.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+            and self.exists(name) and self.size(name) >= MIN_COMPRESS_SIZE
+        })
+        with ThreadPoolExecutor(max_workers=settings.STATIC_COMPRESS_WORKERS) as pool:
+            results = pool.map(compress_file, [self.path(name) for name in names])
+            for name, suffixes in zip(names, results):
+                for suffix in suffixes:
+                    yield name, name + suffix, True
@@ -0,0 +1,116 @@
+# core/sweeper.py
+# Очистка устаревших строк: истёкших сессий и брошенных корзин.
+# Строки обрабатываются пачками по диапазонам первичного ключа: короткий запрос
+# выбирает ключи следующей пачки по индексу, затем одна команда удаляет (или
+# архивирует) строки в диапазоне [первый ключ, последний ключ], повторно проверяя
+# условие. Каждая пачка — отдельная короткая транзакция, между пачками пауза,
+# поэтому очистка не держит долгих блокировок и не мешает магазину в рабочее время.
+import logging
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from cart.storage import user_cart_key
+from orders.models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+
+class SweepStats(namedtuple('SweepStats', 'name rows batches seconds')):
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+    def __str__(self):
+        return (f'{self.name}: {self.rows} row(s) in {self.batches} batch(es), '
+                f'{self.seconds:.1f}s, {self.rows_per_second:.0f} rows/s')
+
+
+def sweep_in_batches(name, queryset, action, batch_size=None, pause=None):
+    """
+    Применяет action к строкам queryset пачками по диапазонам первичного ключа.
+    action получает queryset, ограниченный диапазоном ключей, и возвращает число
+    обработанных строк.
+    """
+    batch_size = batch_size or settings.SWEEP_BATCH_SIZE
+    pause = settings.SWEEP_BATCH_PAUSE if pause is None else pause
+    rows = batches = 0
+    last_key = None
+    started = time.monotonic()
+    while True:
+        window = queryset if last_key is None else queryset.filter(pk__gt=last_key)
+        keys = list(window.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            break
+        rows += action(queryset.filter(pk__gte=keys[0], pk__lte=keys[-1]))
+        batches += 1
+        last_key = keys[-1]
+        if len(keys) < batch_size:
+            break
+        time.sleep(pause)
+    stats = SweepStats(name, rows, batches, time.monotonic() - started)
+    logger.info("Очистка: %s", stats)
+    return stats
+
+
+def _delete(queryset):
+    # У сессий нет связей и сигналов — Django удаляет их одним DELETE без выборки
+    return queryset.delete()[0]
+
+
+def _raw_delete(queryset):
+    # Без выборки объектов и сигналов post_delete: сигналы корзины сбрасывают кэш
+    # пользователя, а в нём хранится только активная корзина
+    return queryset._raw_delete(queryset.db)
+
+
+def _last_activity_before(cutoff):
+    """Корзины, созданные до cutoff, в которых с тех пор ничего не меняли."""
+    recent_items = CartItem.objects.filter(cart_id=OuterRef('pk'), updated_at__gte=cutoff)
+    return Cart.objects.filter(created_at__lt=cutoff, order__isnull=True).exclude(Exists(recent_items))
+
+
+def expired_sessions(now=None):
+    return Session.objects.filter(expire_date__lt=now or timezone.now())
+
+
+def abandoned_carts(now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=settings.CART_ABANDON_DAYS)
+    return _last_activity_before(cutoff).filter(status='active')
+
+
+def stale_carts(now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=settings.CART_RETENTION_DAYS)
+    return _last_activity_before(cutoff).filter(status='canceled')
+
+
+def _archive_carts(queryset):
+    user_ids = list(queryset.values_list('user_id', flat=True))
+    archived = queryset.update(status='canceled')
+    cache.delete_many([user_cart_key(user_id) for user_id in user_ids])
+    return archived
+
+
+def _delete_carts(queryset):
+    _raw_delete(CartItem.objects.filter(cart__in=queryset))
+    return _raw_delete(queryset)
+
+
+def sweep_expired(batch_size=None, pause=None, now=None):
+    """
+    Удаляет истёкшие сессии, переводит брошенные активные корзины в 'canceled'
+    и удаляет отменённые корзины старше срока хранения. Корзины заказов не трогает.
+    """
+    now = now or timezone.now()
+    return [
+        sweep_in_batches('sessions', expired_sessions(now), _delete, batch_size, pause),
+        sweep_in_batches('abandoned carts', abandoned_carts(now), _archive_carts, batch_size, pause),
+        sweep_in_batches('stale carts', stale_carts(now), _delete_carts, batch_size, pause),
+    ]
@@ -207,3 +207,37 @@ def assign_courier_task():
     logger.info(
         f"=== Завершение assign_courier_task. Назначено заказов: {assigned_count} ==="
     )
+
+
+def sweep_expired_task():
+    """
+    Удаляет истёкшие сессии и старые корзины небольшими пачками (см. core/sweeper.py).
+    """
+    logger.info("=== Начало выполнения sweep_expired_task ===")
+    from .sweeper import sweep_expired
+
+    # Итоги каждого этапа (строк в секунду) пишет сам sweep_in_batches
+    sweep_expired()
+    logger.info("=== Завершение sweep_expired_task ===")
+
+
+def process_payments_task():
+    """
+    Подбирает оплаты, оставшиеся в очереди (например, после перезапуска процесса),
+    и уточняет у шлюза исход зависших в processing.
+    """
+    from orders.payments import process_pending_payments
+
+    outcomes = process_pending_payments()
+    if outcomes:
+        logger.info(f"Обработано оплат из очереди: {dict(outcomes)}")
+
+
+def apply_payment_events_task():
+    """
+    Применяет события вебхуков шлюза, которые не успел обработать фоновый поток.
+    """
+    from orders.webhooks import apply_pending_events
+
+    # Итоги (событий в секунду) пишет сам apply_pending_events
+    apply_pending_events()
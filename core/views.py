@@ -1,3 +1,95 @@
-from django.shortcuts import render
+import mimetypes
+import os
+import posixpath
+from functools import lru_cache
+from urllib.parse import quote
 
-# Create your views here.
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.static import serve
+
+from .storage import is_hashed_path
+
+# Файлы под хэшем содержимого не меняются никогда
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Файлы статики без хэша в имени (их запрашивают по старым адресам)
+UNHASHED_STATIC_MAX_AGE = 60 * 60
+# Заранее сжатые копии статики в порядке предпочтения (см. CompressedManifestStaticFilesStorage)
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def serve_media(request, path):
+    """
+    Отдаёт файлы из MEDIA_ROOT. При заданном MEDIA_ACCEL_REDIRECT_PREFIX сам файл
+    отправляет nginx (X-Accel-Redirect), иначе — FileResponse, который сервер
+    приложений может передать через sendfile.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    # Путь за пределами MEDIA_ROOT даёт SuspiciousFileOperation (ответ 400)
+    full_path = safe_join(settings.MEDIA_ROOT, path)
+
+    accel_prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+    if accel_prefix:
+        # Существование файла и условные запросы проверяет nginx
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        response['X-Accel-Redirect'] = quote(accel_prefix.rstrip('/') + '/' + path)
+    else:
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+
+    if is_hashed_path(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        # Старые файлы с человеческими именами могут быть перезаписаны
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_MUTABLE_MAX_AGE)
+    return response
+
+
+def accepts_encoding(accept_encoding, encoding):
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip().lower() != encoding:
+            continue
+        key, _, value = params.replace(' ', '').partition('=')
+        try:
+            return key != 'q' or float(value) > 0
+        except ValueError:
+            return True
+    return False
+
+
+@lru_cache(maxsize=1)
+def hashed_static_names():
+    # Значения манифеста staticfiles.json — имена с хэшем содержимого
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def serve_static(request, path):
+    """
+    Отдаёт собранную статику из STATIC_ROOT. Если клиент принимает brotli или gzip
+    и collectstatic создал сжатую копию, отдаётся она — сжатия во время запроса нет.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    full_path = safe_join(settings.STATIC_ROOT, path)
+
+    served_path, encoding = path, None
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    for name, suffix in STATIC_ENCODINGS:
+        if accepts_encoding(accept_encoding, name) and os.path.isfile(full_path + suffix):
+            served_path, encoding = path + suffix, name
+            break
+
+    response = serve(request, served_path, document_root=settings.STATIC_ROOT)
+    if encoding:
+        response['Content-Type'] = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    if path in hashed_static_names():
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=UNHASHED_STATIC_MAX_AGE)
+    return response
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flower_shop.settings')
+# Под ASGI частые JSON-эндпоинты обслуживаются асинхронными представлениями
+os.environ.setdefault('ASYNC_JSON_VIEWS', '1')
 
 application = get_asgi_application()
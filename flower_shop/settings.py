@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -139,17 +141,116 @@ WSGI_APPLICATION = 'flower_shop.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Параметры подключения задаются переменными окружения, чтобы dev/stage/prod
+# отличались только окружением. Значения по умолчанию — для локальной разработки.
+def env_bool(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'flowershop',
-        'USER': 'postgres',
-        'PASSWORD': '',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'flowershop'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Проверка соединения перед повторным использованием (и в пуле, и для постоянных соединений)
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+# Пул соединений psycopg 3 (нужен пакет psycopg-pool). Без пула каждый запрос
+# открывает новое соединение, что особенно дорого для частых GPS-пингов курьеров.
+DB_POOL = env_bool('DB_POOL', True)
+if DB_POOL:
+    # Пул несовместим с постоянными соединениями, поэтому CONN_MAX_AGE = 0
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        # Сколько секунд ждать свободное соединение, прежде чем выдать ошибку
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        # Лишние простаивающие соединения закрываются через max_idle секунд
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+    }
+else:
+    # Без пула держим постоянные соединения на уровне потока
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+
+
+# Асинхронные версии JSON-эндпоинтов (GPS-пинги, трекинг, расчёт доставки).
+# flower_shop/asgi.py включает их по умолчанию, под WSGI остаются синхронные.
+ASYNC_JSON_VIEWS = env_bool('ASYNC_JSON_VIEWS', False)
+
+
+# Кэш. LocMemCache живёт внутри одного процесса: при нескольких воркерах
+# сброс версий карточек каталога виден только в своём процессе, поэтому
+# в продакшене задаётся REDIS_URL (нужен пакет redis), а без него кэши
+# каталога и корзин не используются (SHARED_CACHE).
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'flowershop',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'flowershop',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+# Виден ли кэш всем процессам. Без общего кэша корзины читаются из базы, а каталог
+# (карточки, страницы, фасеты, индексы тегов и подсказок) собирается заново на каждый
+# запрос: иначе другие воркеры отдавали бы устаревшую копию. Для единственного
+# процесса (runserver) можно включить и с LocMemCache
+SHARED_CACHE = env_bool('SHARED_CACHE', bool(REDIS_URL))
+
+# Время жизни отрендеренной карточки букета в кэше, секунды
+CATALOG_CARD_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CARD_CACHE_TIMEOUT', 60 * 60 * 24))
+# Время жизни целой страницы каталога для анонимных посетителей, секунды
+CATALOG_PAGE_CACHE_TIMEOUT = int(os.environ.get('CATALOG_PAGE_CACHE_TIMEOUT', 60 * 10))
+# Время жизни счётчиков фильтров каталога (фасетов) для одной комбинации фильтров, секунды
+CATALOG_FACET_CACHE_TIMEOUT = int(os.environ.get('CATALOG_FACET_CACHE_TIMEOUT', 60 * 10))
+
+# Сессии: чтение из кэша, запись в базу фоновым потоком после ответа (core/session_backend.py).
+# С LocMemCache и несколькими воркерами сессия кэшируется в каждом процессе отдельно,
+# поэтому в продакшене нужен общий кэш (REDIS_URL).
+SESSION_ENGINE = 'core.session_backend'
+# False — писать в базу сразу, как django.contrib.sessions.backends.cached_db
+SESSION_DB_WRITE_BEHIND = env_bool('SESSION_DB_WRITE_BEHIND', True)
+SESSION_DB_WRITE_WORKERS = int(os.environ.get('SESSION_DB_WRITE_WORKERS', 1))
+
+# Оплаты (orders/payments.py): шлюз — путь к классу и его параметры (JSON),
+# по умолчанию локальная заглушка orders.gateway.StubGateway
+PAYMENT_GATEWAY = os.environ.get('PAYMENT_GATEWAY', 'orders.gateway.StubGateway')
+PAYMENT_GATEWAY_OPTIONS = json.loads(os.environ.get('PAYMENT_GATEWAY_OPTIONS', '{}'))
+# Сколько секунд ждать ответа шлюза на одну попытку
+PAYMENT_GATEWAY_TIMEOUT = float(os.environ.get('PAYMENT_GATEWAY_TIMEOUT', 10))
+# Попыток при временных ошибках шлюза и базовая пауза между ними (растёт с номером попытки)
+PAYMENT_MAX_ATTEMPTS = int(os.environ.get('PAYMENT_MAX_ATTEMPTS', 3))
+PAYMENT_RETRY_DELAY = float(os.environ.get('PAYMENT_RETRY_DELAY', 2))
+# Исход оплаты, которая висит в processing дольше стольких секунд, уточняется у шлюза
+PAYMENT_PROCESSING_TIMEOUT = int(os.environ.get('PAYMENT_PROCESSING_TIMEOUT', 120))
+# False — оплаты проводит только команда process_payments (отдельный процесс)
+PAYMENT_PROCESS_IN_BACKGROUND = env_bool('PAYMENT_PROCESS_IN_BACKGROUND', True)
+PAYMENT_WORKERS = int(os.environ.get('PAYMENT_WORKERS', 2))
+# Секрет подписи вебхуков шлюза (HMAC-SHA256 тела в заголовке X-Signature).
+# Общеизвестный секрет для разработки — только при DEBUG; без секрета вебхуки отклоняются
+PAYMENT_WEBHOOK_SECRET = os.environ.get('PAYMENT_WEBHOOK_SECRET', 'dev-payment-webhook-secret' if DEBUG else '')
+# Событий вебхуков в одной пачке обработчика (orders/webhooks.py)
+PAYMENT_EVENT_BATCH_SIZE = int(os.environ.get('PAYMENT_EVENT_BATCH_SIZE', 200))
+
+# Потоки фонового пула, создающего уменьшенные копии загруженных фото (catalog/images.py)
+IMAGE_DERIVATIVE_WORKERS = int(os.environ.get('IMAGE_DERIVATIVE_WORKERS', 2))
 
 
 # Password validation
@@ -193,6 +294,27 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Медиа сохраняются под хэшем содержимого (core/storage.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.ContentHashStorage',
+    },
+    # collectstatic создаёт хэшированные имена, staticfiles.json и копии .gz/.br
+    'staticfiles': {
+        'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+# Потоки для сжатия статики при collectstatic
+STATIC_COMPRESS_WORKERS = int(os.environ.get('STATIC_COMPRESS_WORKERS', os.cpu_count() or 1))
+
+# Медиа отдаёт core.views.serve_media. За nginx задайте префикс внутреннего location,
+# тогда файл отправит сам nginx:
+#   location /protected-media/ { internal; alias /path/to/media/; }
+# Без префикса маршрут /media/ подключается только при DEBUG (flower_shop/urls.py)
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '')
+# Срок кэширования старых файлов с человеческими именами, секунды
+MEDIA_MUTABLE_MAX_AGE = int(os.environ.get('MEDIA_MUTABLE_MAX_AGE', 60 * 60))
+
 # Настройки для отображения изображений в админке
 ADMIN_MEDIA_PREFIX = '/static/admin/'
 
@@ -212,6 +334,19 @@ AUTHENTICATION_FORM = 'users.forms.CustomAuthenticationForm'
 
 # settings.py
 CART_SESSION_ID = 'cart'
+# Время жизни корзины пользователя в кэше (cart/storage.py), секунды.
+# Кэшируется только при общем кэше (SHARED_CACHE)
+CART_CACHE_TIMEOUT = int(os.environ.get('CART_CACHE_TIMEOUT', 60 * 60 * 24))
+# Активная корзина без изменений дольше стольких дней считается брошенной и отменяется
+CART_ABANDON_DAYS = int(os.environ.get('CART_ABANDON_DAYS', 30))
+# Отменённые корзины без изменений дольше стольких дней удаляются
+CART_RETENTION_DAYS = int(os.environ.get('CART_RETENTION_DAYS', 90))
+
+# Очистка истёкших сессий и старых корзин (core/sweeper.py): строк в пачке,
+# пауза между пачками (секунды) и час ночного запуска в планировщике
+SWEEP_BATCH_SIZE = int(os.environ.get('SWEEP_BATCH_SIZE', 1000))
+SWEEP_BATCH_PAUSE = float(os.environ.get('SWEEP_BATCH_PAUSE', 0.2))
+SWEEP_HOUR = int(os.environ.get('SWEEP_HOUR', 4))
 
 # URL для перенаправления после входа/выхода (можно изменить)
 LOGIN_REDIRECT_URL = None  # Убираем дефолтный редирект, теперь он определяется в CustomLoginView
@@ -1,8 +1,10 @@
 # flower_shop/urls.py
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from core.views import serve_media, serve_static
 from . import views
 
 urlpatterns = [
@@ -12,8 +14,13 @@ urlpatterns = [
     path('catalog/', include(('catalog.urls', 'catalog'), namespace='catalog')),
     path('orders/', include(('orders.urls', 'orders'), namespace='orders')),
     path('cart/', include('cart.urls', namespace='cart')),
+    # Под runserver в DEBUG статику раньше перехватывает django.contrib.staticfiles
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.STATIC_URL.lstrip('/')), serve_static, name='static'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
+# Без X-Accel-Redirect файл передаёт сам Django, занимая воркер на всё время отдачи,
+# поэтому в продакшене без префикса /media/ должен отдавать веб-сервер
+if settings.DEBUG or settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+    urlpatterns.append(
+        re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media')
+    )
@@ -13,7 +13,7 @@ from django.template.response import TemplateResponse
 
 from .models import (
     CourierLocation, UserStatus, WorkRecord,
-    Order, OrderItem, Payment, Cart, CartItem
+    Order, OrderItem, Payment, PaymentEvent, Cart, CartItem
 )
 
 class OrderStatisticsMixin:
@@ -106,8 +106,8 @@ class OrderItemInline(admin.TabularInline): # или admin.StackedInline
 # Inline для отображения оплаты прямо в заказе
 class PaymentInline(admin.StackedInline):
     model = Payment
-    fields = ('amount', 'status', 'payment_method', 'paid_at', 'error_message')
-    readonly_fields = ('amount', 'paid_at') # Сумму и время не меняем тут
+    fields = ('amount', 'status', 'payment_method', 'paid_at', 'error_message', 'gateway_reference', 'attempts')
+    readonly_fields = ('amount', 'paid_at', 'gateway_reference', 'attempts') # Сумму, время и данные шлюза не меняем тут
     extra = 0
     can_delete = False # Нельзя удалить оплату отдельно от заказа
 
@@ -173,6 +173,8 @@ class OrderAdmin(OrderStatisticsMixin, admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at', 'total_cost') # Не даем менять вычисляемые/авто поля
     list_select_related = ('customer', 'florist', 'courier') # Оптимизация запросов для списка
     list_per_page = 15
+    ordering = ('-created_at', '-id') # Использует индекс order_created_idx
+    show_full_result_count = False # Не считаем COUNT(*) по всей таблице при фильтрации
 
     fieldsets = (
         ('Main Information', {
@@ -239,6 +241,21 @@ class PaymentAdmin(admin.ModelAdmin):
         )
     admin_actions.short_description = 'Actions'
 
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    # События шлюза только просматриваются: таблица пополняется вебхуком
+    list_display = ('id', 'event_id', 'event_type', 'payment', 'received_at', 'processed_at', 'result')
+    list_filter = ('event_type', 'result')
+    search_fields = ('event_id', 'payment__order__id')
+    readonly_fields = ('event_id', 'event_type', 'payment', 'payload', 'received_at', 'processed_at', 'result')
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
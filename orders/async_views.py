@@ -0,0 +1,83 @@
+# orders/async_views.py
+# Асинхронные версии частых JSON-эндпоинтов (GPS-пинги курьера, трекинг, расчёт доставки,
+# опрос статуса оплаты).
+# Подключаются в orders/urls.py при ASYNC_JSON_VIEWS=True (по умолчанию под ASGI),
+# синхронные версии из orders/views.py остаются для WSGI.
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, HttpResponseNotAllowed, Http404
+from django.utils import timezone
+
+from core.decorators import role_required
+from .models import CourierLocation, Order, Payment
+from .payments import PAYMENT_STATUS_FIELDS, payment_status_payload
+from .tracking import (
+    TRACKING_FIELDS, can_view_tracking, parse_coordinates, quote_delivery, tracking_payload,
+)
+
+
+@role_required('courier')
+async def courier_update_location(request, pk):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    user = await request.auser()
+    try:
+        lat, lon = parse_coordinates(request.POST.get('lat'), request.POST.get('lon'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    try:
+        last_update = timezone.now()
+        # Один UPDATE вместо SELECT + UPDATE: заказ должен быть назначен курьеру и находиться в доставке
+        updated = await Order.objects.filter(id=pk, courier=user, status='delivering').aupdate(
+            courier_lat=lat, courier_lon=lon, courier_last_update=last_update
+        )
+        if not updated:
+            raise Http404("No Order matches the given query.")
+
+        await CourierLocation.objects.aupdate_or_create(
+            user=user,
+            defaults={'latitude': lat, 'longitude': lon}
+        )
+    except Http404:
+        raise
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': f'Server error: {str(e)}'}, status=500)
+
+    return JsonResponse({
+        'status': 'success',
+        'lat': lat,
+        'lon': lon,
+        'last_update': last_update.strftime('%H:%M:%S')
+    })
+
+
+@login_required
+async def order_tracking(request, pk):
+    order_values = await Order.objects.filter(pk=pk).values(*TRACKING_FIELDS).afirst()
+    if order_values is None:
+        raise Http404("Order not found")
+    if not can_view_tracking(await request.auser(), order_values):
+        return JsonResponse({'status': 'error', 'message': 'Forbidden'}, status=403)
+    return JsonResponse(tracking_payload(order_values))
+
+
+@role_required('client')
+async def delivery_quote(request):
+    try:
+        lat, lon = parse_coordinates(request.GET.get('lat'), request.GET.get('lon'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse(quote_delivery(lat, lon))
+
+
+@role_required('client')
+async def payment_status(request, order_id):
+    user = await request.auser()
+    payment_values = await (
+        Payment.objects.filter(order_id=order_id, order__customer=user)
+        .values(*PAYMENT_STATUS_FIELDS).afirst()
+    )
+    if payment_values is None:
+        raise Http404("Payment not found")
+    return JsonResponse(payment_status_payload(payment_values))
@@ -7,6 +7,8 @@ class OrderCreateForm(forms.ModelForm):
     delivery_lat = forms.FloatField(widget=forms.HiddenInput(), required=False)
     delivery_lon = forms.FloatField(widget=forms.HiddenInput(), required=False)
     delivery_distance = forms.FloatField(widget=forms.HiddenInput(), required=False)
+    # Выдаётся при открытии формы (order_create); отправки с одним ключом дают один заказ
+    idempotency_key = forms.RegexField(regex=r'^[0-9a-f]{32}$', widget=forms.HiddenInput(), required=False)
 
     class Meta:
         model = Order
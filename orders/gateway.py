@@ -0,0 +1,101 @@
+# orders/gateway.py
+# Интерфейс платёжного шлюза и локальная заглушка.
+# Обработчик оплат (orders/payments.py) вызывает только PaymentGateway.charge и lookup;
+# класс шлюза и его параметры задаются в settings.PAYMENT_GATEWAY / PAYMENT_GATEWAY_OPTIONS.
+import random
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# success — деньги списаны; иначе error_message объясняет отказ банка
+GatewayResult = namedtuple('GatewayResult', 'success reference error_message')
+
+
+class GatewayError(Exception):
+    """Временная ошибка шлюза (сеть, 5xx): списания не было, оплату можно повторить."""
+
+
+class GatewayTimeout(GatewayError):
+    """Шлюз не ответил за отведённое время: списание могло пройти, исход неизвестен."""
+
+
+class PaymentGateway:
+
+    def charge(self, payment, timeout, idempotency_key):
+        """
+        Списывает payment.amount по заказу payment.order_id.
+        Повторный запрос с тем же idempotency_key не списывает деньги снова,
+        а возвращает результат первого списания.
+        Возвращает GatewayResult; при временной ошибке выбрасывает GatewayError,
+        если не уложился в timeout секунд — GatewayTimeout.
+        """
+        raise NotImplementedError
+
+    def lookup(self, idempotency_key, timeout):
+        """
+        Исход списания с этим ключом: GatewayResult или None, если шлюз запроса не получал.
+        Если шлюз недоступен, выбрасывает GatewayError.
+        """
+        raise NotImplementedError
+
+
+class StubGateway(PaymentGateway):
+    """
+    Имитация шлюза для разработки и нагрузочных тестов: случайная задержка,
+    доля отказов банка и доля временных сбоев. Ничего никуда не отправляет.
+    Списания помнит по ключу идемпотентности в памяти процесса.
+    """
+
+    DECLINE_MESSAGES = (
+        "Недостаточно средств", "Карта заблокирована", "Неверные данные карты",
+    )
+
+    def __init__(self, min_latency=0.5, max_latency=3.0, decline_rate=0.15, error_rate=0.05):
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.decline_rate = decline_rate
+        self.error_rate = error_rate
+        self._charges = {}
+        self._lock = threading.Lock()
+
+    def charge(self, payment, timeout, idempotency_key):
+        with self._lock:
+            if idempotency_key in self._charges:
+                return self._charges[idempotency_key]
+        latency = random.uniform(self.min_latency, self.max_latency)
+
+        roll = random.random()
+        if roll < self.error_rate:
+            time.sleep(min(latency, timeout))
+            raise GatewayError("Ошибка шлюза банка")
+        if roll < self.error_rate + self.decline_rate:
+            result = GatewayResult(False, '', random.choice(self.DECLINE_MESSAGES))
+        else:
+            result = GatewayResult(True, f'stub-{uuid.uuid4().hex}', None)
+        # Банк отвечает раньше, чем ответ доходит до нас: при таймауте списание уже
+        # выполнено и его исход виден через lookup
+        with self._lock:
+            result = self._charges.setdefault(idempotency_key, result)
+        if latency > timeout:
+            time.sleep(timeout)
+            raise GatewayTimeout(f"Шлюз не ответил за {timeout:g} с")
+        time.sleep(latency)
+        return result
+
+    def lookup(self, idempotency_key, timeout):
+        with self._lock:
+            return self._charges.get(idempotency_key)
+
+
+_gateway = None
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        _gateway = import_string(settings.PAYMENT_GATEWAY)(**settings.PAYMENT_GATEWAY_OPTIONS)
+    return _gateway
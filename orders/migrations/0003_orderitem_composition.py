@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='composition',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Composition'),
+        ),
+    ]
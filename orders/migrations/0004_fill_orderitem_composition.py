@@ -0,0 +1,25 @@
+# Заполняет OrderItem.composition у существующих позиций текущим составом букета —
+# состав на момент покупки для старых заказов не сохранился.
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_compositions(apps, schema_editor):
+    Bouquet = apps.get_model('catalog', 'Bouquet')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    OrderItem.objects.update(composition=Subquery(
+        Bouquet.objects.filter(pk=OuterRef('bouquet_id')).values('composition')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_orderitem_composition'),
+        ('catalog', '0009_fill_bouquet_composition'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_compositions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicates(apps, schema_editor):
+    """Сводит данные к виду, который допускают новые ограничения уникальности."""
+    Cart = apps.get_model('orders', 'Cart')
+    CartItem = apps.get_model('orders', 'CartItem')
+
+    # Активной остаётся самая новая корзина пользователя, остальные отменяются
+    users = (
+        Cart.objects.filter(status='active').values('user_id')
+        .annotate(carts=Count('id')).filter(carts__gt=1).values_list('user_id', flat=True)
+    )
+    for user_id in users:
+        stale = Cart.objects.filter(user_id=user_id, status='active').order_by('-created_at', '-id')[1:]
+        Cart.objects.filter(pk__in=[cart.pk for cart in stale]).update(status='canceled')
+
+    # Повторяющиеся позиции одного букета складываются в одну
+    duplicates = (
+        CartItem.objects.values('cart_id', 'bouquet_id')
+        .annotate(rows=Count('id')).filter(rows__gt=1)
+    )
+    for row in duplicates:
+        items = list(CartItem.objects.filter(cart_id=row['cart_id'], bouquet_id=row['bouquet_id']).order_by('id'))
+        keep = items[0]
+        keep.quantity = sum(item.quantity for item in items)
+        keep.save(update_fields=['quantity'])
+        CartItem.objects.filter(pk__in=[item.pk for item in items[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_fill_bouquet_composition'),
+        ('orders', '0004_fill_orderitem_composition'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Price'),
+        ),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'active')), fields=('user',), name='cart_one_active_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'bouquet'), name='cartitem_cart_bouquet_uniq'),
+        ),
+    ]
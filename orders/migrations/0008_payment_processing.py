@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Attempts'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='error_message',
+            field=models.TextField(blank=True, null=True, verbose_name='Error Message'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='gateway_reference',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Gateway Reference'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Processing started at'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('pending', 'Pending'), ('processing', 'Processing'), ('success', 'Success'), ('failed', 'Failed'), ('refunded', 'Refunded')], default='pending', max_length=30, verbose_name='Payment Status'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'id'], name='payment_status_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_payment_processing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=128, unique=True, verbose_name='Event ID')),
+                ('event_type', models.CharField(max_length=50, verbose_name='Event Type')),
+                ('payload', models.JSONField(verbose_name='Payload')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Received at')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processed at')),
+                ('result', models.CharField(blank=True, choices=[('applied', 'Applied'), ('ignored', 'Ignored'), ('invalid', 'Invalid')], max_length=20, verbose_name='Result')),
+                ('payment', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='orders.payment', verbose_name='Payment')),
+            ],
+            options={
+                'verbose_name': 'Payment Event',
+                'verbose_name_plural': 'Payment Events',
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='paymentevent_unprocessed_idx')],
+            },
+        ),
+    ]
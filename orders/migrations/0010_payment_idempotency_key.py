@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-19 11:00
+
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+
+def fill_in_progress_keys(apps, schema_editor):
+    # Оплатам, отправленным до появления ключа, нужен ключ для повторов и проверки у шлюза
+    Payment = apps.get_model('orders', 'Payment')
+    Payment.objects.filter(status__in=('pending', 'processing')).update(
+        idempotency_key=Concat(Value('payment-'), Cast('id', CharField()))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_payment_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='idempotency_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='Idempotency Key'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('pending', 'Pending'), ('processing', 'Processing'), ('success', 'Success'), ('failed', 'Failed'), ('refunded', 'Refunded')], default='new', max_length=30, verbose_name='Payment Status'),
+        ),
+        migrations.RunPython(fill_in_progress_keys, migrations.RunPython.noop),
+    ]
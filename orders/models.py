@@ -94,6 +94,9 @@ class Order(models.Model):
     
     cart = models.OneToOneField('Cart', on_delete=models.PROTECT, 
                             related_name='order', verbose_name="Cart", null=True)
+    # Ключ, выданный вместе с формой оформления: повторная отправка той же формы
+    # находит уже созданный заказ вместо создания второго
+    idempotency_key = models.CharField("Idempotency Key", max_length=64, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"Order #{self.id} from {self.created_at.date()}"
@@ -101,17 +104,30 @@ class Order(models.Model):
     class Meta:
         verbose_name = "Order"
         verbose_name_plural = "Orders"
+        # Составные индексы под keyset-пагинацию списков заказов
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_created_idx'),
+            models.Index(fields=['florist', 'status', 'delivery_datetime', 'id'], name='order_florist_delivery_idx'),
+            models.Index(fields=['courier', 'status', 'delivery_datetime', 'id'], name='order_courier_delivery_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'idempotency_key'], name='order_customer_idempotency_uniq'),
+        ]
         
     def get_bouquet_cost(self):
         return self.total_cost - self.delivery_cost
     
-    def _deduct_flowers(self):
+    def _item_compositions(self):
+        """Пары (количество, состав на момент покупки) по позициям заказа — один запрос."""
+        return list(self.items.values_list('quantity', 'composition'))
+
+    def _deduct_flowers(self, item_compositions):
         required_flowers = defaultdict(int)
-        for item in self.items.all():
-            bouquet = item.bouquet
-            order_item_quantity = item.quantity
-            for bouquet_flower_item in bouquet.flower_items.all(): 
-                required_flowers[bouquet_flower_item.flower_id] += bouquet_flower_item.quantity * order_item_quantity
+        # Состав берётся из снимка, сохранённого в позиции заказа при оформлении
+        for order_item_quantity, composition in item_compositions:
+            for component in composition.get('flowers', []):
+                required_flowers[component['id']] += component['quantity'] * order_item_quantity
         
         if not required_flowers:
             return
@@ -153,13 +169,11 @@ class Order(models.Model):
         print(f"Цветы для заказа #{self.id} успешно списаны.")
 
 
-    def _deduct_ribbons(self):
+    def _deduct_ribbons(self, item_compositions):
         required_ribbons = defaultdict(float) 
-        for item in self.items.all():
-            bouquet = item.bouquet
-            order_item_quantity = item.quantity
-            for bouquet_ribbon_item in bouquet.ribbon_items.all(): 
-                required_ribbons[bouquet_ribbon_item.ribbon_id] += bouquet_ribbon_item.length * order_item_quantity
+        for order_item_quantity, composition in item_compositions:
+            for component in composition.get('ribbons', []):
+                required_ribbons[component['id']] += component['length'] * order_item_quantity
         
         if not required_ribbons:
             return
@@ -202,13 +216,11 @@ class Order(models.Model):
                 raise ValidationError(f"Критическая ошибка при списании ленты '{ribbon_instance.name}'. Транзакция будет отменена.")
         print(f"Ленты для заказа #{self.id} успешно списаны.")
 
-    def _deduct_wrappers(self):
+    def _deduct_wrappers(self, item_compositions):
         required_wrappers = defaultdict(float) 
-        for item in self.items.all():
-            bouquet = item.bouquet
-            order_item_quantity = item.quantity
-            for bouquet_wrapper_item in bouquet.wrapper_items.all(): # related_name="wrapper_items"
-                required_wrappers[bouquet_wrapper_item.wrapper_id] += bouquet_wrapper_item.length * order_item_quantity
+        for order_item_quantity, composition in item_compositions:
+            for component in composition.get('wrappers', []):
+                required_wrappers[component['id']] += component['length'] * order_item_quantity
 
         if not required_wrappers:
             return
@@ -253,9 +265,11 @@ class Order(models.Model):
 
     def deduct_all_stock_components(self):
         with transaction.atomic():
-            self._deduct_flowers()
-            self._deduct_ribbons()
-            self._deduct_wrappers()
+            # Позиции заказа читаются один раз для всех трёх видов компонентов
+            item_compositions = self._item_compositions()
+            self._deduct_flowers(item_compositions)
+            self._deduct_ribbons(item_compositions)
+            self._deduct_wrappers(item_compositions)
         
         print(f"Все компоненты для заказа #{self.id} успешно списаны со склада.")
 
@@ -266,6 +280,15 @@ class OrderItem(models.Model):
                             related_name='order_items', verbose_name="Bouquet")
     quantity = models.PositiveIntegerField("Quantity")
     price_per_item = models.DecimalField("Price per item", max_digits=10, decimal_places=2)
+    # Состав букета на момент покупки (копия Bouquet.composition): списание и отчёты
+    # не зависят от последующих правок букета
+    composition = models.JSONField("Composition", default=dict, blank=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        # Позиции из админки и прочие одиночные сохранения тоже получают снимок состава
+        if not self.composition and self.bouquet_id:
+            self.composition = Bouquet.objects.values_list('composition', flat=True).get(pk=self.bouquet_id)
+        super().save(*args, **kwargs)
 
     def get_total(self):
         return self.quantity * self.price_per_item
@@ -279,7 +302,10 @@ class OrderItem(models.Model):
         unique_together = ('order', 'bouquet')
 
 class Payment(models.Model):
+    # new -> pending (передан в обработку) -> processing (запрос к шлюзу) -> success/failed;
+    # после failed оплату можно отправить снова. Переходы — в orders/payments.py
     STATUS_CHOICES = [
+        ('new', 'New'),
         ('pending', 'Pending'),
         ('processing', 'Processing'),
         ('success', 'Success'),
@@ -296,10 +322,19 @@ class Payment(models.Model):
                              related_name='payment', verbose_name="Order")
     amount = models.DecimalField("Amount", max_digits=10, decimal_places=2)
     status = models.CharField("Payment Status", max_length=30, 
-                          choices=STATUS_CHOICES, default='pending')
+                          choices=STATUS_CHOICES, default='new')
     payment_method = models.CharField("Payment Method", max_length=30,
                                   choices=PAYMENT_METHOD_CHOICES)
     paid_at = models.DateTimeField("Paid at", null=True, blank=True)
+    error_message = models.TextField("Error Message", null=True, blank=True)
+    # Номер операции на стороне платёжного шлюза
+    gateway_reference = models.CharField("Gateway Reference", max_length=64, blank=True, default='')
+    attempts = models.PositiveSmallIntegerField("Attempts", default=0)
+    # Ключ списания в шлюзе: новый при каждой отправке оплаты, общий для всех её попыток,
+    # поэтому повтор запроса после сбоя не спишет деньги второй раз
+    idempotency_key = models.CharField("Idempotency Key", max_length=64, blank=True, default='', editable=False)
+    # Когда обработчик взял оплату; исход зависших дольше PAYMENT_PROCESSING_TIMEOUT уточняется у шлюза
+    processing_started_at = models.DateTimeField("Processing started at", null=True, blank=True)
     
     def __str__(self):
         return f"Payment for Order #{self.order.id}"
@@ -307,6 +342,46 @@ class Payment(models.Model):
     class Meta:
         verbose_name = "Payment"
         verbose_name_plural = "Payments"
+        indexes = [
+            # Очередь обработчика: pending/processing по порядку id
+            models.Index(fields=['status', 'id'], name='payment_status_idx'),
+        ]
+
+class PaymentEvent(models.Model):
+    """
+    Уведомление платёжного шлюза (вебхук) в том виде, в каком оно пришло.
+    Таблица только пополняется; обработчик (orders/webhooks.py) отмечает
+    processed_at и result, не трогая само событие.
+    """
+    RESULT_CHOICES = [
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+        ('invalid', 'Invalid'),
+    ]
+
+    # Идентификатор события у шлюза: повторная доставка того же события не создаёт строку
+    event_id = models.CharField("Event ID", max_length=128, unique=True)
+    event_type = models.CharField("Event Type", max_length=50)
+    # Без ограничения внешнего ключа: событие записывается как есть, даже если id оплаты
+    # неизвестен, — такое событие обработчик отметит как invalid
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False,
+                                related_name='events', verbose_name="Payment")
+    payload = models.JSONField("Payload")
+    received_at = models.DateTimeField("Received at", auto_now_add=True)
+    processed_at = models.DateTimeField("Processed at", null=True, blank=True)
+    result = models.CharField("Result", max_length=20, choices=RESULT_CHOICES, blank=True)
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id}"
+
+    class Meta:
+        verbose_name = "Payment Event"
+        verbose_name_plural = "Payment Events"
+        indexes = [
+            # Очередь необработанных событий по порядку поступления
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True),
+                         name='paymentevent_unprocessed_idx'),
+        ]
 
 class Cart(models.Model):
     STATUS_CHOICES = [
@@ -327,6 +402,12 @@ class Cart(models.Model):
     class Meta:
         verbose_name = "Cart"
         verbose_name_plural = "Carts"
+        constraints = [
+            # У пользователя одна активная корзина (cart/storage.py находит её по user_id)
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(status='active'), name='cart_one_active_per_user'
+            ),
+        ]
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE,
@@ -334,10 +415,19 @@ class CartItem(models.Model):
     bouquet = models.ForeignKey(Bouquet, on_delete=models.CASCADE,
                             related_name='cart_items', verbose_name="Bouquet")
     quantity = models.PositiveIntegerField("Quantity")
+    # Цена букета на момент добавления в корзину
+    price = models.DecimalField("Price", max_digits=10, decimal_places=2, null=True, blank=True)
+    # Обновляется той же вставкой-обновлением, что и количество; по нему очистка
+    # (core/sweeper.py) находит брошенные корзины
+    updated_at = models.DateTimeField("Updated at", auto_now=True)
     
     def __str__(self):
         return f"{self.bouquet} x{self.quantity} in cart"
 
     class Meta:
         verbose_name = "Cart Item"
-        verbose_name_plural = "Cart Items"
\ No newline at end of file
+        verbose_name_plural = "Cart Items"
+        constraints = [
+            # По ней корзина записывается одним INSERT ... ON CONFLICT (cart/storage.py)
+            models.UniqueConstraint(fields=['cart', 'bouquet'], name='cartitem_cart_bouquet_uniq'),
+        ]
\ No newline at end of file
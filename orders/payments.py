@@ -0,0 +1,206 @@
+# orders/payments.py
+# Обработка оплат вне запроса.
+# order_pay только переводит оплату new/failed -> pending и ставит её в очередь;
+# запрос к шлюзу выполняет фоновый поток (PAYMENT_WORKERS) или команда process_payments.
+# Каждый переход — условный UPDATE по текущему статусу, поэтому оплату не возьмут
+# в работу дважды, а повторное применение того же результата ничего не меняет.
+# Все запросы к шлюзу по одной отправке оплаты идут с одним ключом идемпотентности;
+# после таймаута или падения обработчика исход списания узнаётся у шлюза (lookup),
+# а не повторным списанием.
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .gateway import GatewayError, GatewayTimeout, get_gateway
+from .models import Order, Payment
+
+logger = logging.getLogger(__name__)
+
+# Оплату можно (повторно) отправить из этих статусов
+SUBMITTABLE_STATUSES = ('new', 'failed')
+IN_PROGRESS_STATUSES = ('pending', 'processing')
+FINAL_STATUSES = ('success', 'failed')
+
+# Поля оплаты для ответа payment_status
+PAYMENT_STATUS_FIELDS = ('id', 'status', 'error_message', 'paid_at')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.PAYMENT_WORKERS, thread_name_prefix='payments')
+    return _executor
+
+
+def _transition(payment_id, from_statuses, to_status, **fields):
+    """Переводит оплату в to_status, только если она сейчас в одном из from_statuses."""
+    return bool(
+        Payment.objects.filter(pk=payment_id, status__in=from_statuses).update(status=to_status, **fields)
+    )
+
+
+def mark_succeeded(payment_id, reference, from_statuses=IN_PROGRESS_STATUSES):
+    """Оплата прошла: payment -> success, заказ new -> paid. False, если переход уже выполнен."""
+    with transaction.atomic():
+        if not _transition(payment_id, from_statuses, 'success', paid_at=timezone.now(),
+                           gateway_reference=reference or '', error_message=None,
+                           processing_started_at=None):
+            return False
+        Order.objects.filter(payment__pk=payment_id, status='new').update(status='paid', updated_at=timezone.now())
+    return True
+
+
+def mark_failed(payment_id, error_message, from_statuses=IN_PROGRESS_STATUSES):
+    return _transition(payment_id, from_statuses, 'failed', error_message=error_message,
+                       processing_started_at=None)
+
+
+def submit_payment(payment):
+    """
+    Ставит оплату в очередь. Возвращает False, если оплата уже обрабатывается или проведена.
+    """
+    if not _transition(payment.pk, SUBMITTABLE_STATUSES, 'pending', error_message=None, attempts=0,
+                       idempotency_key=f'payment-{payment.pk}-{uuid.uuid4().hex}'):
+        return False
+    payment_id = payment.pk
+    transaction.on_commit(lambda: schedule_payment(payment_id))
+    return True
+
+
+def schedule_payment(payment_id):
+    # Без фонового пула оплату заберёт команда process_payments
+    if settings.PAYMENT_PROCESS_IN_BACKGROUND:
+        get_executor().submit(_process_in_background, payment_id)
+
+
+def _process_in_background(payment_id):
+    try:
+        process_payment(payment_id)
+    except Exception:
+        logger.exception("Ошибка обработки оплаты #%s", payment_id)
+    finally:
+        close_old_connections()
+
+
+def _apply_result(payment_id, result):
+    if result.success:
+        mark_succeeded(payment_id, result.reference, ('processing',))
+        return 'success'
+    mark_failed(payment_id, result.error_message, ('processing',))
+    return 'failed'
+
+
+def _retry_or_fail(payment, error):
+    """
+    Списания не было: возвращает оплату в очередь и ждёт перед повтором (True)
+    или, если попытки кончились, отклоняет её (False).
+    """
+    if payment.attempts >= settings.PAYMENT_MAX_ATTEMPTS:
+        logger.warning("Оплата #%s: шлюз недоступен после %s попыток: %s", payment.pk, payment.attempts, error)
+        mark_failed(payment.pk, str(error), ('processing',))
+        return False
+    logger.info("Оплата #%s: попытка %s не удалась (%s), повтор", payment.pk, payment.attempts, error)
+    _transition(payment.pk, ('processing',), 'pending', processing_started_at=None)
+    time.sleep(settings.PAYMENT_RETRY_DELAY * payment.attempts)
+    return True
+
+
+def process_payment(payment_id, gateway=None):
+    """
+    Проводит оплату через шлюз: pending -> processing -> success/failed.
+    Временные ошибки шлюза повторяются с тем же ключом до PAYMENT_MAX_ATTEMPTS раз
+    с растущей паузой. После таймаута исход запрашивается у шлюза; если шлюз и тогда
+    не ответил, оплата остаётся в processing до settle_stuck_payments или вебхука.
+    Возвращает итоговый статус или None, если оплату уже взял другой обработчик.
+    """
+    gateway = gateway or get_gateway()
+    while True:
+        if not _transition(payment_id, ('pending',), 'processing',
+                           processing_started_at=timezone.now(), attempts=F('attempts') + 1):
+            return None
+        payment = Payment.objects.get(pk=payment_id)
+        try:
+            result = gateway.charge(payment, settings.PAYMENT_GATEWAY_TIMEOUT, payment.idempotency_key)
+        except GatewayTimeout as e:
+            # Списание могло пройти: повторять его вслепую нельзя
+            logger.warning("Оплата #%s: %s, уточняем исход у шлюза", payment_id, e)
+            try:
+                result = gateway.lookup(payment.idempotency_key, settings.PAYMENT_GATEWAY_TIMEOUT)
+            except GatewayError as e:
+                logger.warning("Оплата #%s: исход списания неизвестен (%s)", payment_id, e)
+                return 'processing'
+            if result is None:
+                if _retry_or_fail(payment, e):
+                    continue
+                return 'failed'
+        except GatewayError as e:
+            if _retry_or_fail(payment, e):
+                continue
+            return 'failed'
+        return _apply_result(payment_id, result)
+
+
+def settle_stuck_payments(gateway=None, now=None):
+    """
+    Уточняет у шлюза исход оплат, которые висят в processing дольше PAYMENT_PROCESSING_TIMEOUT
+    (обработчик упал, процесс перезапустили, шлюз не ответил). Проведённые и отклонённые
+    шлюзом получают его результат; оплаты, запроса по которым шлюз не получал, возвращаются
+    в очередь; если шлюз недоступен, оплата ждёт следующей проверки или вебхука.
+    Возвращает Counter исходов.
+    """
+    gateway = gateway or get_gateway()
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.PAYMENT_PROCESSING_TIMEOUT)
+    stuck = (
+        Payment.objects.filter(status='processing', processing_started_at__lt=cutoff)
+        .order_by('id').only('id', 'idempotency_key')
+    )
+    outcomes = Counter()
+    for payment in stuck:
+        try:
+            result = gateway.lookup(payment.idempotency_key, settings.PAYMENT_GATEWAY_TIMEOUT)
+        except GatewayError as e:
+            logger.warning("Оплата #%s: исход списания неизвестен (%s)", payment.pk, e)
+            outcomes['processing'] += 1
+            continue
+        if result is not None:
+            outcomes[_apply_result(payment.pk, result)] += 1
+        elif _transition(payment.pk, ('processing',), 'pending', processing_started_at=None):
+            outcomes['pending'] += 1
+    return outcomes
+
+
+def process_pending_payments(limit=None, gateway=None):
+    """Обрабатывает очередь оплат по порядку id. Возвращает Counter итоговых статусов."""
+    settled = settle_stuck_payments(gateway)
+    if settled:
+        logger.warning("Зависшие оплаты: %s", dict(settled))
+    payment_ids = Payment.objects.filter(status='pending').order_by('id').values_list('id', flat=True)
+    if limit:
+        payment_ids = payment_ids[:limit]
+    outcomes = Counter()
+    for payment_id in list(payment_ids):
+        outcomes[process_payment(payment_id, gateway) or 'skipped'] += 1
+    return outcomes
+
+
+def payment_status_payload(payment_values):
+    return {
+        'status': 'success',
+        'payment_status': payment_values['status'],
+        'done': payment_values['status'] in FINAL_STATUSES,
+        'error_message': payment_values['error_message'],
+        'paid_at': payment_values['paid_at'].isoformat() if payment_values['paid_at'] else None,
+    }
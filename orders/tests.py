@@ -1,3 +1,346 @@
-from django.test import TestCase
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import Bouquet
+
+from . import views
+from .gateway import GatewayError, GatewayResult, GatewayTimeout, PaymentGateway, StubGateway
+from .models import Order, Payment, PaymentEvent
+from .payments import process_payment, settle_stuck_payments, submit_payment
+from .webhooks import SIGNATURE_HEADER, apply_pending_events, build_event, replay_events, sign
+
+_numbers = count(1)
+
+
+def create_customer():
+    number = next(_numbers)
+    return get_user_model().objects.create_user(
+        username=f'client{number}', email=f'client{number}@example.com', password='password', role='client'
+    )
+
+
+def create_payment(customer=None, **fields):
+    order = Order.objects.create(
+        customer=customer or create_customer(),
+        delivery_datetime=timezone.now() + timedelta(days=1),
+        total_cost=Decimal('1500.00'),
+        delivery_address_name='Москва, Тверская, 1',
+        delivery_lat=55.757,
+        delivery_lon=37.615,
+        recipient_name='Анна',
+        recipient_phone='+79990000000',
+    )
+    return Payment.objects.create(order=order, amount=order.total_cost, **fields)
+
+
+class ScriptedGateway(PaymentGateway):
+    """Шлюз для тестов: отвечает по очереди заданными ответами, исключения выбрасывает."""
+
+    def __init__(self, charges=(), lookups=()):
+        self.charges = list(charges)
+        self.lookups = list(lookups)
+        self.charge_keys = []
+        self.lookup_keys = []
+
+    def charge(self, payment, timeout, idempotency_key):
+        self.charge_keys.append(idempotency_key)
+        return self._next(self.charges)
+
+    def lookup(self, idempotency_key, timeout):
+        self.lookup_keys.append(idempotency_key)
+        return self._next(self.lookups)
+
+    @staticmethod
+    def _next(answers):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+SUCCEEDED = GatewayResult(True, 'ref-1', None)
+DECLINED = GatewayResult(False, '', 'Недостаточно средств')
+
+
+@override_settings(PAYMENT_PROCESS_IN_BACKGROUND=False, PAYMENT_MAX_ATTEMPTS=3, PAYMENT_RETRY_DELAY=0,
+                   PAYMENT_PROCESSING_TIMEOUT=120)
+class PaymentProcessingTests(TestCase):
+
+    def submitted_payment(self):
+        payment = create_payment()
+        self.assertTrue(submit_payment(payment))
+        payment.refresh_from_db()
+        return payment
+
+    def test_new_payment_defaults_to_new(self):
+        self.assertEqual(create_payment().status, 'new')
+
+    def test_submit_queues_payment_once(self):
+        payment = self.submitted_payment()
+        self.assertEqual(payment.status, 'pending')
+        self.assertTrue(payment.idempotency_key)
+        self.assertFalse(submit_payment(payment))
+
+    def test_resubmit_after_failure_gets_new_key(self):
+        payment = self.submitted_payment()
+        process_payment(payment.pk, ScriptedGateway([DECLINED]))
+        first_key = payment.idempotency_key
+        self.assertTrue(submit_payment(payment))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+        self.assertNotEqual(payment.idempotency_key, first_key)
+
+    def test_success_marks_order_paid(self):
+        payment = self.submitted_payment()
+        gateway = ScriptedGateway([SUCCEEDED])
+        self.assertEqual(process_payment(payment.pk, gateway), 'success')
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.gateway_reference), ('success', 'ref-1'))
+        self.assertIsNotNone(payment.paid_at)
+        self.assertEqual(payment.order.status, 'paid')
+        self.assertEqual(gateway.charge_keys, [payment.idempotency_key])
+
+    def test_decline_marks_payment_failed(self):
+        payment = self.submitted_payment()
+        self.assertEqual(process_payment(payment.pk, ScriptedGateway([DECLINED])), 'failed')
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.error_message), ('failed', 'Недостаточно средств'))
+        self.assertEqual(payment.order.status, 'new')
+
+    def test_payment_taken_by_other_worker_is_skipped(self):
+        payment = create_payment()
+        gateway = ScriptedGateway()
+        self.assertIsNone(process_payment(payment.pk, gateway))
+        self.assertEqual(gateway.charge_keys, [])
+
+    def test_gateway_error_is_retried_with_same_key(self):
+        payment = self.submitted_payment()
+        gateway = ScriptedGateway([GatewayError('502'), SUCCEEDED])
+        self.assertEqual(process_payment(payment.pk, gateway), 'success')
+        payment.refresh_from_db()
+        self.assertEqual(payment.attempts, 2)
+        self.assertEqual(gateway.charge_keys, [payment.idempotency_key] * 2)
+
+    def test_retries_exhausted_mark_payment_failed(self):
+        payment = self.submitted_payment()
+        gateway = ScriptedGateway([GatewayError('502')] * 3)
+        self.assertEqual(process_payment(payment.pk, gateway), 'failed')
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.attempts, payment.error_message), ('failed', 3, '502'))
+
+    def test_timeout_is_settled_by_lookup_not_by_second_charge(self):
+        payment = self.submitted_payment()
+        gateway = ScriptedGateway([GatewayTimeout('timeout')], [SUCCEEDED])
+        self.assertEqual(process_payment(payment.pk, gateway), 'success')
+        self.assertEqual(gateway.charge_keys, [payment.idempotency_key])
+        self.assertEqual(gateway.lookup_keys, [payment.idempotency_key])
+
+    def test_timeout_with_unknown_outcome_stays_processing(self):
+        payment = self.submitted_payment()
+        gateway = ScriptedGateway([GatewayTimeout('timeout')], [GatewayError('502')])
+        self.assertEqual(process_payment(payment.pk, gateway), 'processing')
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'processing')
+        self.assertEqual(len(gateway.charge_keys), 1)
+
+    def test_timeout_never_received_by_gateway_is_retried(self):
+        payment = self.submitted_payment()
+        gateway = ScriptedGateway([GatewayTimeout('timeout'), SUCCEEDED], [None])
+        self.assertEqual(process_payment(payment.pk, gateway), 'success')
+        self.assertEqual(gateway.charge_keys, [payment.idempotency_key] * 2)
+
+    def stuck_payment(self, seconds_ago=600):
+        payment = self.submitted_payment()
+        Payment.objects.filter(pk=payment.pk).update(
+            status='processing', attempts=1, processing_started_at=timezone.now() - timedelta(seconds=seconds_ago)
+        )
+        return payment
+
+    def test_stuck_payment_takes_gateway_result(self):
+        payment = self.stuck_payment()
+        gateway = ScriptedGateway(lookups=[SUCCEEDED])
+        self.assertEqual(settle_stuck_payments(gateway), {'success': 1})
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'success')
+        self.assertEqual(gateway.charge_keys, [])
+
+    def test_stuck_payment_unknown_to_gateway_is_requeued(self):
+        payment = self.stuck_payment()
+        self.assertEqual(settle_stuck_payments(ScriptedGateway(lookups=[None])), {'pending': 1})
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.processing_started_at), ('pending', None))
+
+    def test_stuck_payment_stays_processing_while_gateway_is_down(self):
+        payment = self.stuck_payment()
+        self.assertEqual(settle_stuck_payments(ScriptedGateway(lookups=[GatewayError('502')])), {'processing': 1})
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'processing')
+
+    def test_recent_processing_payment_is_left_alone(self):
+        self.stuck_payment(seconds_ago=10)
+        gateway = ScriptedGateway()
+        self.assertEqual(settle_stuck_payments(gateway), {})
+        self.assertEqual(gateway.lookup_keys, [])
+
+
+class StubGatewayTests(TestCase):
+
+    def test_same_key_is_charged_once(self):
+        gateway = StubGateway(min_latency=0, max_latency=0, decline_rate=0, error_rate=0)
+        first = gateway.charge(None, 1, 'payment-1-a')
+        self.assertEqual(gateway.charge(None, 1, 'payment-1-a'), first)
+        self.assertEqual(gateway.lookup('payment-1-a', 1), first)
+        self.assertNotEqual(gateway.charge(None, 1, 'payment-1-b'), first)
+        self.assertIsNone(gateway.lookup('payment-2-a', 1))
+
+    def test_timed_out_charge_is_visible_to_lookup(self):
+        gateway = StubGateway(min_latency=0.02, max_latency=0.02, decline_rate=0, error_rate=0)
+        with self.assertRaises(GatewayTimeout):
+            gateway.charge(None, 0.01, 'payment-1-a')
+        self.assertTrue(gateway.lookup('payment-1-a', 1).success)
+
+
+@override_settings(PAYMENT_PROCESS_IN_BACKGROUND=False, PAYMENT_WEBHOOK_SECRET='test-secret')
+class PaymentWebhookTests(TestCase):
+
+    def post_event(self, body, signature=None):
+        return self.client.post(
+            reverse('orders:payment_webhook'), body, content_type='application/json',
+            headers={SIGNATURE_HEADER: sign(body) if signature is None else signature},
+        )
+
+    def pending_payment(self):
+        payment = create_payment()
+        submit_payment(payment)
+        return payment
+
+    def test_event_is_applied(self):
+        payment = self.pending_payment()
+        self.assertEqual(self.post_event(build_event(payment.pk, True, reference='ref-1')).status_code, 200)
+        self.assertEqual(apply_pending_events().applied, 1)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.gateway_reference), ('success', 'ref-1'))
+        self.assertEqual(payment.order.status, 'paid')
+
+    def test_duplicate_event_id_is_stored_once(self):
+        payment = self.pending_payment()
+        body = build_event(payment.pk, False, error_message='Карта заблокирована', event_id='evt_1')
+        self.assertEqual(self.post_event(body).status_code, 200)
+        self.assertEqual(self.post_event(body).status_code, 200)
+        self.assertEqual(PaymentEvent.objects.filter(event_id='evt_1').count(), 1)
+        self.assertEqual(apply_pending_events().events, 1)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.error_message), ('failed', 'Карта заблокирована'))
+
+    def test_bad_signature_is_rejected(self):
+        payment = self.pending_payment()
+        self.assertEqual(self.post_event(build_event(payment.pk, True), signature='0' * 64).status_code, 403)
+        self.assertEqual(self.post_event(build_event(payment.pk, True), signature='').status_code, 403)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    @override_settings(PAYMENT_WEBHOOK_SECRET='')
+    def test_webhooks_rejected_without_secret(self):
+        payment = self.pending_payment()
+        self.assertEqual(self.post_event(build_event(payment.pk, True), signature='0' * 64).status_code, 503)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_unknown_payment_is_invalid(self):
+        self.assertEqual(self.post_event(build_event(999999, True)).status_code, 200)
+        stats = apply_pending_events()
+        self.assertEqual((stats.applied, stats.invalid), (0, 1))
+
+    def test_boolean_payment_id_is_invalid(self):
+        payment = self.pending_payment()
+        self.post_event(build_event(True, True))
+        self.assertIsNone(PaymentEvent.objects.get().payment_id)
+        self.assertEqual(apply_pending_events().invalid, 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+    def test_success_for_unsubmitted_payment_is_ignored(self):
+        payment = create_payment()
+        self.post_event(build_event(payment.pk, True))
+        self.assertEqual(apply_pending_events().ignored, 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'new')
+
+    def test_replay_does_not_change_applied_events(self):
+        payment = self.pending_payment()
+        self.post_event(build_event(payment.pk, True, reference='ref-1'))
+        self.post_event(build_event(payment.pk, False, error_message='Недостаточно средств'))
+        first = apply_pending_events()
+        self.assertEqual((first.applied, first.ignored), (1, 1))
+        reset, replayed = replay_events(PaymentEvent.objects.all())
+        self.assertEqual((reset, replayed.applied, replayed.ignored), (2, 0, 2))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'success')
+
+
+class OrderCreateIdempotencyTests(TestCase):
+
+    def setUp(self):
+        self.customer = create_customer()
+        self.client.force_login(self.customer)
+        self.bouquet = Bouquet.objects.create(name='Розы', price=Decimal('2500.00'), description='Букет роз')
+
+    def fill_cart(self):
+        self.client.post(reverse('cart:add_to_cart', args=[self.bouquet.pk]), {'quantity': 2})
+
+    def checkout(self, idempotency_key):
+        return self.client.post(reverse('orders:order_create'), {
+            'recipient_name': 'Анна',
+            'recipient_phone': '+79990000000',
+            'delivery_address_name': 'Москва, Тверская, 1',
+            'delivery_datetime': (timezone.localtime() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M'),
+            'delivery_lat': 55.757,
+            'delivery_lon': 37.615,
+            'delivery_distance': 1200,
+            'idempotency_key': idempotency_key,
+        })
+
+    def pay_url(self, order):
+        return reverse('orders:order_pay', kwargs={'order_id': order.pk})
+
+    def test_repeat_post_with_same_key_returns_existing_order(self):
+        self.fill_cart()
+        key = uuid.uuid4().hex
+        first = self.checkout(key)
+        order = Order.objects.get(customer=self.customer)
+        self.assertRedirects(first, self.pay_url(order), fetch_redirect_response=False)
+        self.assertEqual((order.idempotency_key, order.items.get().quantity), (key, 2))
+
+        # Корзина после первого заказа пуста, но повтор всё равно находит заказ
+        second = self.checkout(key)
+        self.assertRedirects(second, self.pay_url(order), fetch_redirect_response=False)
+        self.assertEqual(Order.objects.filter(customer=self.customer).count(), 1)
+        self.assertEqual(Payment.objects.filter(order__customer=self.customer).count(), 1)
+
+    def test_concurrent_insert_with_same_key_returns_existing_order(self):
+        key = uuid.uuid4().hex
+        existing = create_payment(customer=self.customer).order
+        Order.objects.filter(pk=existing.pk).update(idempotency_key=key)
+        self.fill_cart()
+        # Параллельный запрос создал заказ после проверки ключа в начале order_create:
+        # первая проверка его не видит, вставка падает на уникальном индексе
+        with mock.patch.object(views, '_order_for_key', side_effect=[None, existing.pk]) as lookup:
+            response = self.checkout(key)
+        self.assertEqual(lookup.call_count, 2)
+        self.assertRedirects(response, self.pay_url(existing), fetch_redirect_response=False)
+        self.assertEqual(Order.objects.filter(customer=self.customer).count(), 1)
+
+    def test_post_without_key_creates_order_each_time(self):
+        for _ in range(2):
+            self.fill_cart()
+            response = self.checkout('')
+            order = Order.objects.filter(customer=self.customer).latest('id')
+            self.assertRedirects(response, self.pay_url(order), fetch_redirect_response=False)
+            self.assertIsNone(order.idempotency_key)
+        self.assertEqual(Order.objects.filter(customer=self.customer).count(), 2)
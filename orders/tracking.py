@@ -0,0 +1,75 @@
+# orders/tracking.py
+# Общая логика JSON-эндпоинтов трекинга и расчёта доставки.
+# Используется и синхронными (orders/views.py), и асинхронными (orders/async_views.py) представлениями.
+import math
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+
+EARTH_RADIUS_METERS = 6371000
+
+# Поля заказа, нужные для ответа трекинга и проверки доступа
+TRACKING_FIELDS = (
+    'id', 'status', 'customer_id', 'florist_id', 'courier_id',
+    'courier_lat', 'courier_lon', 'courier_last_update',
+)
+
+
+def parse_coordinates(lat_str, lon_str):
+    """
+    Разбирает и проверяет пару координат.
+    Возвращает (lat, lon), округлённые до 6 знаков, или выбрасывает ValueError с текстом ошибки.
+    """
+    if lat_str is None or lon_str is None:
+        raise ValueError('Missing lat/lon parameters')
+    try:
+        lat = float(lat_str)
+        lon = float(lon_str)
+    except ValueError:
+        raise ValueError('Invalid coordinates format. Must be float.')
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        raise ValueError('Coordinates out of valid range')
+    return round(lat, 6), round(lon, 6)
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Расстояние между двумя точками по формуле гаверсинусов, в метрах."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return EARTH_RADIUS_METERS * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def quote_delivery(lat, lon):
+    """
+    Предварительная стоимость доставки от магазина до точки (по прямой, как запасной
+    расчёт в форме заказа). Базы данных не касается.
+    """
+    distance = haversine_distance(float(settings.SHOP_LAT), float(settings.SHOP_LON), lat, lon)
+    cost = Decimal(str(distance * float(settings.BASE_DELIVERY_PRICE_PER_METER)))
+    return {
+        'status': 'success',
+        'distance': round(distance),
+        'delivery_cost': str(cost.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)),
+    }
+
+
+def can_view_tracking(user, order_values):
+    return (
+        user.is_staff
+        or user.id in (order_values['customer_id'], order_values['florist_id'], order_values['courier_id'])
+    )
+
+
+def tracking_payload(order_values):
+    """Ответ трекинга по словарю из .values(*TRACKING_FIELDS)."""
+    last_update = order_values['courier_last_update']
+    return {
+        'status': 'success',
+        'order_status': order_values['status'],
+        'lat': order_values['courier_lat'],
+        'lon': order_values['courier_lon'],
+        'last_update': last_update.isoformat() if last_update else None,
+    }
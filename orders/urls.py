@@ -1,16 +1,24 @@
 # orders/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
 
 app_name = 'orders'
 
+# Частые JSON-эндпоинты: под ASGI используем асинхронные версии, под WSGI — синхронные
+json_views = async_views if settings.ASYNC_JSON_VIEWS else views
+
 urlpatterns = [
     # Клиентские URL
     path('create/', views.order_create, name='order_create'),
     path('<int:order_id>/pay/', views.order_pay, name='order_pay'),
+    path('<int:order_id>/payment-status/', json_views.payment_status, name='payment_status'),
+    path('payments/webhook/', views.payment_webhook, name='payment_webhook'),
     path('my/', views.order_list, name='order_list'),
     path('<int:pk>/', views.order_detail, name='order_detail'),
     path('<int:pk>/confirm/', views.order_confirm_completion, name='order_confirm'),
+    path('<int:pk>/tracking/', json_views.order_tracking, name='order_tracking'),
+    path('delivery-quote/', json_views.delivery_quote, name='delivery_quote'),
 
     # URL Флориста
     path('florist/dashboard/', views.florist_dashboard, name='florist_dashboard'),
@@ -20,5 +28,5 @@ urlpatterns = [
     path('courier/dashboard/', views.courier_dashboard, name='courier_dashboard'),
     path('courier/task/<int:pk>/start/', views.courier_start_delivery, name='courier_start_delivery'),
     path('courier/task/<int:pk>/complete/', views.courier_task_complete, name='courier_task_complete'),
-    path('courier/task/<int:pk>/update-location/', views.courier_update_location, name='courier_update_location'),
+    path('courier/task/<int:pk>/update-location/', json_views.courier_update_location, name='courier_update_location'),
 ]
\ No newline at end of file
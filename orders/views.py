@@ -1,6 +1,6 @@
 # orders/views.py
 import time
-import random
+import uuid
 from decimal import Decimal
 from functools import wraps
 from django.shortcuts import render, redirect, get_object_or_404
@@ -8,20 +8,47 @@ from django.urls import reverse
 from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.conf import settings
-from django.http import JsonResponse, HttpResponseNotAllowed
-from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponseNotAllowed, Http404
 from django.core.exceptions import PermissionDenied, ValidationError
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from cart.cart import Cart
 from core.decorators import role_required
+from core.pagination import KeysetPaginator
 from .models import CourierLocation, Order, OrderItem, Payment
+from .payments import PAYMENT_STATUS_FIELDS, payment_status_payload, submit_payment
+from .webhooks import SIGNATURE_HEADER, WebhookError, receive_event
 from .forms import OrderCreateForm, PaymentForm
+from .tracking import (
+    TRACKING_FIELDS, can_view_tracking, parse_coordinates, quote_delivery, tracking_payload,
+)
+
+
+def _order_for_key(user, idempotency_key):
+    """id заказа, уже созданного пользователем по этому ключу, или None (поиск по уникальному индексу)."""
+    if not idempotency_key:
+        return None
+    return Order.objects.filter(customer=user, idempotency_key=idempotency_key).values_list('id', flat=True).first()
+
+
+def _redirect_to_existing_order(request, order_id):
+    messages.info(request, f"Заказ №{order_id} уже оформлен.")
+    return redirect(reverse('orders:order_pay', kwargs={'order_id': order_id}))
 
 
 @role_required('client')
 def order_create(request):
+    if request.method == 'POST':
+        # Повторная отправка формы (двойной клик, повтор запроса сетью) — возвращаем
+        # созданный заказ до проверки корзины: после первого заказа она уже пуста
+        idempotency_key = request.POST.get('idempotency_key')
+        existing_order_id = _order_for_key(request.user, idempotency_key)
+        if existing_order_id is not None:
+            return _redirect_to_existing_order(request, existing_order_id)
+
     cart = Cart(request)
     if len(cart) == 0:
         messages.warning(request, "Ваша корзина пуста.")
@@ -29,11 +56,21 @@ def order_create(request):
 
     if request.method == 'POST':
         form = OrderCreateForm(request.POST)
-        if form.is_valid():
+        # Цены и наличие сверяются одним запросом до транзакции; если что-то изменилось,
+        # покупатель видит изменения и подтверждает заказ повторной отправкой формы
+        price_diff = cart.revalidate() if form.is_valid() else None
+        if price_diff and len(cart) == 0:
+            messages.warning(request, "Букеты из корзины больше недоступны.")
+            return redirect('cart:cart_detail')
+        if price_diff:
+            messages.warning(request, "Цены или наличие букетов изменились. Проверьте заказ и подтвердите его ещё раз.")
+        elif form.is_valid():
             try:
                 with transaction.atomic():
                     order = form.save(commit=False)
                     order.customer = request.user
+                    # Без ключа (форма открыта до его появления) — заказ без защиты от повтора
+                    order.idempotency_key = form.cleaned_data['idempotency_key'] or None
                     order.delivery_distance = form.cleaned_data['delivery_distance']
                     
                     delivery_cost = Decimal(str(order.delivery_distance * float(settings.BASE_DELIVERY_PRICE_PER_METER)))
@@ -41,6 +78,8 @@ def order_create(request):
                     
                     cart_total = Decimal(str(cart.get_total_price()))
                     order.total_cost = cart_total + delivery_cost
+                    # Корзина в базе остаётся при заказе как его исходные данные
+                    order.cart_id = cart.cart_id
                     
                     order.save()
 
@@ -57,6 +96,8 @@ def order_create(request):
                                 bouquet=bouquet_obj,
                                 price_per_item=item_data['price'],
                                 quantity=item_data['quantity'],
+                                # Состав фиксируется на момент покупки
+                                composition=bouquet_obj.composition,
                             )
                         )
                     OrderItem.objects.bulk_create(order_items)
@@ -67,20 +108,27 @@ def order_create(request):
                         status="new"
                     )
 
-                cart.clear()
+                cart.close('ordered')
                 messages.success(request, "Заказ успешно создан. Перенаправляем на страницу оплаты.")
                 return redirect(reverse('orders:order_pay', kwargs={'order_id': order.id}))
 
+            except IntegrityError as e:
+                # Параллельный запрос с тем же ключом успел создать заказ первым
+                existing_order_id = _order_for_key(request.user, form.cleaned_data['idempotency_key'])
+                if existing_order_id is not None:
+                    return _redirect_to_existing_order(request, existing_order_id)
+                messages.error(request, f"Ошибка при создании заказа: {str(e)}")
             except Exception as e:
                 messages.error(request, f"Ошибка при создании заказа: {str(e)}")
         context = {
             'form': form,
             'cart': cart,
+            'price_diff': price_diff,
             'settings': settings
         }
         return render(request, 'orders/order_form.html', context)
     else: 
-        form = OrderCreateForm()
+        form = OrderCreateForm(initial={'idempotency_key': uuid.uuid4().hex})
         context = {
             'form': form,
             'cart': cart,
@@ -94,48 +142,20 @@ def order_pay(request, order_id):
     order = get_object_or_404(Order, id=order_id, customer=request.user)
     payment = order.payment 
 
-    if order.status != "new" or payment.status != "new" and payment.status != "failed":
+    if payment.status == "success":
+        messages.success(request, f"Оплата заказа №{order.id} прошла успешно!")
+        return redirect("orders:order_detail", pk=order.id)
+    if order.status != "new":
         messages.info(request, "Этот заказ уже обрабатывается или оплачен.")
         return redirect("orders:order_detail", pk=order.id)
     if request.method == 'POST':
         form = PaymentForm(request.POST)
         if form.is_valid():
-            payment.status = "pending"
-            payment.save()
-
-            payment_successful = random.choices([True, False], weights=[85, 15], k=1)[0]
-
-            try:
-                with transaction.atomic():
-                    if payment_successful:
-                        payment.status = "success"
-                        payment.paid_at = timezone.now()
-                        payment.error_message = None
-                        order.status = "paid"
-                        messages.success(request, f"Оплата заказа №{order.id} прошла успешно!")
-                    else:
-                        payment.status = "failed"
-                        payment.error_message = random.choice([
-                            "Недостаточно средств", "Ошибка шлюза банка",
-                            "Карта заблокирована", "Неверные данные карты",
-                        ])
-                        messages.error(request, f"Оплата заказа №{order.id} не удалась: {payment.error_message}")
-                    
-                    payment.save()
-                    order.save()
-
-            except Exception as e:
-                payment.status = "failed"
-                payment.error_message = f"Внутренняя ошибка системы: {e}"
-                payment.save()
-                messages.error(request, "Произошла системная ошибка при обработке платежа. Попробуйте позже или свяжитесь с поддержкой.")
-                return redirect("orders:order_detail", pk=order.id)
-
-            if payment.status == "success":
-                return redirect("orders:order_detail", pk=order.id)
-            else:
-                context = {"order": order, "payment": payment, "form": form}
-                return render(request, "orders/order_pay.html", context)
+            # Запрос к шлюзу выполняется в фоне (orders/payments.py), страница
+            # оплаты опрашивает payment_status до результата
+            if not submit_payment(payment):
+                messages.info(request, "Оплата уже обрабатывается.")
+            return redirect("orders:order_pay", order_id=order.id)
         else: 
             context = {"order": order, "payment": payment, "form": form}
             messages.error(request, "Пожалуйста, проверьте правильность введенных данных карты.")
@@ -150,12 +170,34 @@ def order_pay(request, order_id):
         return render(request, "orders/order_pay.html", context)
 
 
+@role_required('client')
+def payment_status(request, order_id):
+    payment_values = (
+        Payment.objects.filter(order_id=order_id, order__customer=request.user)
+        .values(*PAYMENT_STATUS_FIELDS).first()
+    )
+    if payment_values is None:
+        raise Http404("Payment not found")
+    return JsonResponse(payment_status_payload(payment_values))
+
+
+@csrf_exempt
+@require_POST
+def payment_webhook(request):
+    # Ответ сразу после записи события: статусы меняет обработчик (orders/webhooks.py)
+    try:
+        receive_event(request.body, request.headers.get(SIGNATURE_HEADER))
+    except WebhookError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status_code)
+    return JsonResponse({'status': 'success'})
+
+
 @role_required('client')
 def order_list(request):
-    orders_list = Order.objects.filter(customer=request.user).order_by("-created_at")
-    paginator = Paginator(orders_list, 10) 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    orders_list = Order.objects.filter(customer=request.user).select_related("payment")
+    # Keyset-пагинация по (created_at, id): глубокие страницы не дороже первой
+    paginator = KeysetPaginator(orders_list, 10, ordering=("-created_at", "-id"))
+    page_obj = paginator.get_page_from_request(request)
     
     context = {
         "orders": page_obj, 
@@ -174,7 +216,8 @@ def order_detail(request, pk):
         messages.error(request, "У вас нет прав для просмотра этого заказа.")
         return redirect('catalog:bouquet_list') # или 'orders:order_list' для клиента
 
-    context = {"order": order}
+    # Состав букетов выводится из снимка в позиции заказа, связи не обходятся
+    context = {"order": order, "items": order.items.select_related("bouquet")}
 
     # Всегда передаем координаты магазина, нужны для построения маршрута
     context["shop_lat"] = float(settings.SHOP_LAT)
@@ -219,17 +262,15 @@ def florist_dashboard(request):
     else: 
         queryset = queryset.filter(status__in=["paid", "ready"])
 
-    assigned_orders_list = queryset.order_by("delivery_datetime")
-    
-    paginator = Paginator(assigned_orders_list, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(queryset, 15, ordering=("delivery_datetime", "id"))
+    page_obj = paginator.get_page_from_request(request)
 
     context = {
         "assigned_orders": page_obj,
         "page_obj": page_obj,
         "is_paginated": page_obj.has_other_pages(),
         "current_status_filter": status_filter,
+        "paid_orders_count": Order.objects.filter(florist=florist, status="paid").count(),
     }
     return render(request, "orders/florist_dashboard.html", context)
 
@@ -283,12 +324,8 @@ def courier_dashboard(request):
     else:  
         queryset = queryset.filter(status__in=["ready", "delivering", "delivered"])
     
-    assigned_deliveries_list = queryset.order_by("delivery_datetime")
-    print(f"Courier queryset for {courier.username} with filter '{status_filter}': {assigned_deliveries_list}")
-
-    paginator = Paginator(assigned_deliveries_list, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(queryset, 15, ordering=("delivery_datetime", "id"))
+    page_obj = paginator.get_page_from_request(request)
 
     context = {
         "assigned_deliveries": page_obj,
@@ -335,20 +372,13 @@ def courier_update_location(request, pk):
     if request.method == 'POST':
         order = get_object_or_404(Order, id=pk, courier=request.user, status='delivering')
         try:
-            lat_str = request.POST.get('lat')
-            lon_str = request.POST.get('lon')
-
-            if lat_str is None or lon_str is None:
-                 return JsonResponse({'status': 'error', 'message': 'Missing lat/lon parameters'}, status=400)
+            try:
+                lat, lon = parse_coordinates(request.POST.get('lat'), request.POST.get('lon'))
+            except ValueError as e:
+                return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
-            lat = float(lat_str)
-            lon = float(lon_str)
-            
-            if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
-                return JsonResponse({'status': 'error', 'message': 'Coordinates out of valid range'}, status=400)
-            
-            order.courier_lat = round(lat, 6)
-            order.courier_lon = round(lon, 6)
+            order.courier_lat = lat
+            order.courier_lon = lon
             order.courier_last_update = timezone.now()
             order.save(update_fields=['courier_lat', 'courier_lon', 'courier_last_update'])
             
@@ -363,8 +393,25 @@ def courier_update_location(request, pk):
                 'lon': order.courier_lon,
                 'last_update': order.courier_last_update.strftime('%H:%M:%S')
             })
-        except ValueError:
-            return JsonResponse({'status': 'error', 'message': 'Invalid coordinates format. Must be float.'}, status=400)
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': f'Server error: {str(e)}'}, status=500)
-    return HttpResponseNotAllowed(['POST'])
\ No newline at end of file
+    return HttpResponseNotAllowed(['POST'])
+
+
+@login_required
+def order_tracking(request, pk):
+    order_values = Order.objects.filter(pk=pk).values(*TRACKING_FIELDS).first()
+    if order_values is None:
+        raise Http404("Order not found")
+    if not can_view_tracking(request.user, order_values):
+        return JsonResponse({'status': 'error', 'message': 'Forbidden'}, status=403)
+    return JsonResponse(tracking_payload(order_values))
+
+
+@role_required('client')
+def delivery_quote(request):
+    try:
+        lat, lon = parse_coordinates(request.GET.get('lat'), request.GET.get('lon'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse(quote_delivery(lat, lon))
@@ -0,0 +1,206 @@
+# orders/webhooks.py
+# Приём и применение уведомлений платёжного шлюза.
+# Вебхук только проверяет подпись и записывает событие в PaymentEvent одним
+# INSERT ... ON CONFLICT DO NOTHING по event_id — повторная доставка ничего не добавляет.
+# Статусы Payment/Order меняет обработчик: берёт необработанные события пачками
+# по порядку поступления и применяет их условными UPDATE (mark_succeeded/mark_failed),
+# поэтому повторное применение и повтор пачки ничего не меняют.
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Payment, PaymentEvent
+from .payments import get_executor, mark_failed, mark_succeeded
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-Signature'
+
+EVENT_SUCCEEDED = 'payment.succeeded'
+EVENT_FAILED = 'payment.failed'
+EVENT_TYPES = (EVENT_SUCCEEDED, EVENT_FAILED)
+
+# Успех, подтверждённый шлюзом, важнее нашего отказа: деньги списаны.
+# Неотправленную оплату (new) шлюз провести не мог — такое событие не применяется
+SUCCEEDED_FROM = ('pending', 'processing', 'failed')
+FAILED_FROM = ('pending', 'processing')
+
+
+class WebhookError(ValueError):
+    status_code = 400
+
+
+class WebhookSignatureError(WebhookError):
+    status_code = 403
+
+
+class WebhookNotConfigured(WebhookError):
+    status_code = 503
+
+
+class EventStats(namedtuple('EventStats', 'events applied ignored invalid batches seconds')):
+
+    @property
+    def events_per_second(self):
+        return self.events / self.seconds if self.seconds else float(self.events)
+
+    def __str__(self):
+        return (f'{self.events} event(s) in {self.batches} batch(es): {self.applied} applied, '
+                f'{self.ignored} ignored, {self.invalid} invalid; '
+                f'{self.seconds:.2f}s, {self.events_per_second:.0f} events/s')
+
+
+def sign(body):
+    if not settings.PAYMENT_WEBHOOK_SECRET:
+        raise ImproperlyConfigured('PAYMENT_WEBHOOK_SECRET is not set')
+    return hmac.new(settings.PAYMENT_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def build_event(payment_id, succeeded, reference='', error_message=None, event_id=None):
+    """Тело события в формате шлюза (для заглушки шлюза и команды fake_payment_webhooks)."""
+    return json.dumps({
+        'id': event_id or f'evt_{uuid.uuid4().hex}',
+        'type': EVENT_SUCCEEDED if succeeded else EVENT_FAILED,
+        'payment_id': payment_id,
+        'reference': reference,
+        'error_message': error_message,
+        'created': timezone.now().isoformat(),
+    }).encode()
+
+
+def parse_event(body):
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise WebhookError('Invalid JSON')
+    if not isinstance(payload, dict) or not payload.get('id'):
+        raise WebhookError('Missing event id')
+    if payload.get('type') not in EVENT_TYPES:
+        raise WebhookError(f"Unsupported event type: {payload.get('type')}")
+    return payload
+
+
+def receive_event(body, signature):
+    """Проверяет подпись и записывает событие; дубликат по event_id молча пропускается."""
+    if not settings.PAYMENT_WEBHOOK_SECRET:
+        logger.error("Вебхук шлюза отклонён: не задан PAYMENT_WEBHOOK_SECRET")
+        raise WebhookNotConfigured('Webhook secret is not configured')
+    if not hmac.compare_digest(sign(body), signature or ''):
+        raise WebhookSignatureError('Invalid signature')
+    payload = parse_event(body)
+    payment_id = payload.get('payment_id')
+    PaymentEvent.objects.bulk_create([
+        PaymentEvent(
+            event_id=str(payload['id'])[:128],
+            event_type=payload['type'],
+            # type(), а не isinstance: true/false в JSON — не номер оплаты
+            payment_id=payment_id if type(payment_id) is int else None,
+            payload=payload,
+        )
+    ], ignore_conflicts=True)
+    transaction.on_commit(schedule_event_application)
+    return payload
+
+
+def _apply(event, known_payment_ids):
+    # Неизвестная оплата — не повтор, а ошибка: условный UPDATE просто не нашёл бы строку
+    if event.payment_id not in known_payment_ids:
+        return 'invalid'
+    if event.event_type == EVENT_SUCCEEDED:
+        changed = mark_succeeded(event.payment_id, event.payload.get('reference'), SUCCEEDED_FROM)
+    else:
+        changed = mark_failed(event.payment_id, event.payload.get('error_message') or 'Платёж отклонён банком',
+                              FAILED_FROM)
+    return 'applied' if changed else 'ignored'
+
+
+def apply_event_batch(batch_size=None):
+    """
+    Применяет одну пачку необработанных событий по порядку id.
+    Параллельные обработчики пропускают чужие строки (SKIP LOCKED). Возвращает Counter результатов.
+    """
+    batch_size = batch_size or settings.PAYMENT_EVENT_BATCH_SIZE
+    with transaction.atomic():
+        events = list(
+            PaymentEvent.objects.filter(processed_at__isnull=True).order_by('id')
+            .select_for_update(skip_locked=True)
+            .only('id', 'event_type', 'payment_id', 'payload')[:batch_size]
+        )
+        # Существование оплат пачки проверяется одним запросом
+        known_payment_ids = set(
+            Payment.objects.filter(pk__in={event.payment_id for event in events if event.payment_id is not None})
+            .values_list('pk', flat=True)
+        )
+        by_result = {}
+        for event in events:
+            by_result.setdefault(_apply(event, known_payment_ids), []).append(event.pk)
+        processed_at = timezone.now()
+        for result, event_ids in by_result.items():
+            PaymentEvent.objects.filter(pk__in=event_ids).update(processed_at=processed_at, result=result)
+    return Counter({result: len(event_ids) for result, event_ids in by_result.items()})
+
+
+def apply_pending_events(batch_size=None):
+    """Применяет все накопившиеся события пачками. Возвращает EventStats."""
+    totals = Counter()
+    batches = 0
+    started = time.monotonic()
+    while True:
+        results = apply_event_batch(batch_size)
+        if not results:
+            break
+        totals.update(results)
+        batches += 1
+    stats = EventStats(sum(totals.values()), totals['applied'], totals['ignored'], totals['invalid'],
+                       batches, time.monotonic() - started)
+    if stats.events:
+        logger.info("События оплат: %s", stats)
+    return stats
+
+
+def replay_events(queryset, batch_size=None):
+    """
+    Повторно применяет выбранные события: сбрасывает отметку обработки и прогоняет очередь.
+    Уже применённые переходы повторно не срабатывают — события получат результат ignored.
+    """
+    reset = queryset.update(processed_at=None, result='')
+    return reset, apply_pending_events(batch_size)
+
+
+_drain_lock = threading.Lock()
+_drain_scheduled = False
+
+
+def schedule_event_application():
+    # Пачка вебхуков подряд запускает один проход обработчика, а не проход на каждое событие
+    global _drain_scheduled
+    if not settings.PAYMENT_PROCESS_IN_BACKGROUND:
+        return
+    with _drain_lock:
+        if _drain_scheduled:
+            return
+        _drain_scheduled = True
+    get_executor().submit(_drain_in_background)
+
+
+def _drain_in_background():
+    global _drain_scheduled
+    with _drain_lock:
+        # События, пришедшие во время прохода, запланируют следующий
+        _drain_scheduled = False
+    try:
+        apply_pending_events()
+    except Exception:
+        logger.exception("Ошибка применения событий оплат")
+    finally:
+        close_old_connections()